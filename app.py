@@ -1,12 +1,10 @@
 # app.py
 import streamlit as st
-from auth.login_ui import login
-from auth.auth import logout
-from ui.nurse_interface import nurse_interface
-from ui.manager_interface import manager_interface
-from ui.karyawan_interface import karyawan_interface
-from ui.master_interface import master_interface  # ✅ added Master interface
+# Interfaces are imported inside main() for the active role only, so e.g. a
+# karyawan arriving from a QR code never loads the dashboard/chart stacks.
+# Track start-up cost with `python import_report.py`.
 from config.settings import APP_TITLE
+from db.database import ensure_schema
 from app_router import handle_qr_landing  # ✅ no changes needed
 
 # --- Patch: load Streamlit secrets fallback for database (no code changes needed elsewhere) ---
@@ -23,6 +21,15 @@ load_dotenv(dotenv_path="supa.env")
 st.set_page_config(page_title=APP_TITLE, layout="wide")
 
 def main():
+    # -------------------------------
+    # 0️⃣ Schema check (cached per process, no DDL)
+    # -------------------------------
+    try:
+        ensure_schema()
+    except RuntimeError as e:
+        st.error(f"❌ {e}")
+        st.stop()
+
     # -------------------------------
     # 1️⃣ Handle QR code landing first
     # -------------------------------
@@ -43,16 +50,20 @@ def main():
 
         # Show logout only for non-QR access or non-karyawan
         if not is_qr_access or role != "Karyawan":
+            from auth.auth import logout
             logout()
 
         # -------------------------------
         # 3️⃣ Route based on role
         # -------------------------------
         if role == "Manager":
+            from ui.manager_interface import manager_interface
             manager_interface()
         elif role == "Tenaga Kesehatan":
+            from ui.nurse_interface import nurse_interface
             nurse_interface()
         elif role == "Karyawan":
+            from ui.karyawan_interface import karyawan_interface
             if is_qr_access and uid:
                 st.sidebar.info("🔒 Akses via QR Code - Terbatas")
                 # ✅ Pass UID to Karyawan interface for QR access
@@ -61,6 +72,7 @@ def main():
                 # Standard login access (uid from session)
                 karyawan_interface(uid=uid)
         elif role == "Master":  # ✅ Master role
+            from ui.master_interface import master_interface
             master_interface()
         else:
             st.error("❌ Role tidak dikenal, hubungi administrator.")
@@ -69,6 +81,7 @@ def main():
         # -------------------------------
         # 4️⃣ Not logged in → show login
         # -------------------------------
+        from auth.login_ui import login
         login()
         
         # If login was successful, let the login function handle the transition
@@ -1,16 +1,29 @@
 # auth/auth.py
 import streamlit as st
-import bcrypt
-from db.database import init_db
-from db.queries import get_user_by_username
+from db.queries import get_user_by_username, replace_password_hash
 from config.settings import SIDEBAR_TITLE
 
-import streamlit as st
-st.write("DB USER:", st.secrets.get("USER"))
-st.write("DB HOST:", st.secrets.get("HOST"))
+def authenticate(username, password):
+    """
+    Return the user record if the password matches, else None.
+    A hash stored with another cost than BCRYPT_ROUNDS is upgraded in the
+    background after a successful login.
+    """
+    from auth.passwords import verify_password, rehash_in_background
 
-# --- Initialize DB ---
-init_db()
+    if not username or not password:
+        return None
+    user = get_user_by_username(username)
+    if not user:
+        return None
+    stored_hash = user["password"]   # string from DB
+    if not verify_password(password, stored_hash):
+        return None
+    rehash_in_background(
+        password, stored_hash,
+        lambda new_hash: replace_password_hash(username, stored_hash, new_hash)
+    )
+    return user
 
 def login():
     """Render login form and validate credentials."""
@@ -20,21 +33,15 @@ def login():
     login_button = st.sidebar.button("Login")
 
     if login_button:
-        result = get_user_by_username(username)
+        result = authenticate(username, password_input)
         if result:
-            stored_hash = result["password"]   # string from DB
             role = result["role"]
-
-            # bcrypt requires bytes
-            if bcrypt.checkpw(password_input.encode("utf-8"), stored_hash.encode("utf-8")):
-                # ✅ Session state without NIK
-                st.session_state["user_role"] = role
-                st.session_state["username"] = username
-                st.session_state["qr_access"] = False  # default for manual login
-                st.success(f"✅ Logged in as {role}")
-                st.rerun()
-            else:
-                st.error("❌ Username atau password salah!")
+            # ✅ Session state without NIK
+            st.session_state["user_role"] = role
+            st.session_state["username"] = username
+            st.session_state["qr_access"] = False  # default for manual login
+            st.success(f"✅ Logged in as {role}")
+            st.rerun()
         else:
             st.error("❌ Username atau password salah!")
 
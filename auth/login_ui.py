@@ -1,8 +1,6 @@
 import streamlit as st
-from PIL import Image
 from pathlib import Path
-from auth.auth import get_user_by_username
-import bcrypt
+from auth.auth import authenticate
 
 def login():
     """Login page with centered logo, welcome text, and input fields using a form."""
@@ -55,6 +53,7 @@ def login():
     st.markdown('<div class="login-container">', unsafe_allow_html=True)
 
     # Logo
+    from PIL import Image
     try:
         logo = Image.open(LOGO_PATH)
         st.image(logo, width=250)  # enlarged logo
@@ -74,8 +73,9 @@ def login():
 
         if submit:
             if username and password:
-                result = get_user_by_username(username)
-                if result and bcrypt.checkpw(password.encode("utf-8"), result["password"].encode("utf-8")):
+                with st.spinner("Memeriksa..."):
+                    result = authenticate(username, password)
+                if result:
                     # --- Update session state ---
                     st.session_state["user_role"] = result["role"]
                     st.session_state["username"] = username
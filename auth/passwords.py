@@ -0,0 +1,122 @@
+# auth/passwords.py
+"""
+Password hashing helpers.
+
+New hashes use the configured bcrypt cost (BCRYPT_ROUNDS). Hashes stored with
+a different cost keep working and are upgraded on the next successful login,
+on a single background thread of their own. bcrypt releases the GIL while
+hashing, so bulk operations (reset all passwords, seeding default users)
+hash in a thread pool instead of one after another.
+
+CLI:
+    python -m auth.passwords calibrate [--budget-ms 250]   # pick BCRYPT_ROUNDS for this machine
+"""
+import argparse
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+from config.settings import BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# Login-time rehashes, one at a time, so a burst of them never competes with logins
+_rehash_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bcrypt-rehash")
+
+
+def hash_password(password: str, rounds=None) -> str:
+    salt = bcrypt.gensalt(rounds=rounds or BCRYPT_ROUNDS)
+    return bcrypt.hashpw(password.encode("utf-8"), salt).decode("utf-8")
+
+
+def hash_passwords(passwords, workers=PASSWORD_HASH_WORKERS) -> list:
+    """Hash many passwords in parallel; results keep the input order, each with its own salt."""
+    passwords = list(passwords)
+    if len(passwords) <= 1 or workers <= 1:
+        return [hash_password(pw) for pw in passwords]
+    with ThreadPoolExecutor(max_workers=min(workers, len(passwords))) as pool:
+        return list(pool.map(hash_password, passwords))
+
+
+def hash_cost(hashed: str):
+    """Cost factor of a bcrypt hash ("$2b$12$..." -> 12), or None if it is not one."""
+    try:
+        return int(hashed.split("$")[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def needs_rehash(hashed: str, rounds=None) -> bool:
+    return hash_cost(hashed) != (rounds or BCRYPT_ROUNDS)
+
+
+def verify_password(password: str, hashed: str) -> bool:
+    try:
+        return bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
+    except (AttributeError, ValueError):
+        return False
+
+
+def rehash_in_background(password: str, hashed: str, save) -> bool:
+    """
+    After a successful login: if hashed was made with another cost, hash the
+    password again with BCRYPT_ROUNDS on the rehash thread and call
+    save(new_hash).
+    Returns True when a rehash was scheduled.
+    """
+    if not needs_rehash(hashed):
+        return False
+
+    def _rehash():
+        try:
+            save(hash_password(password))
+        except Exception:
+            # Login already succeeded; the old hash stays valid and is retried next time
+            logger.warning("Password rehash failed", exc_info=True)
+
+    _rehash_executor.submit(_rehash)
+    return True
+
+
+def calibrate(budget_ms=250.0, min_rounds=10, max_rounds=16, samples=3):
+    """
+    Time bcrypt on this machine. Returns (recommended_rounds, {rounds: ms}):
+    the highest cost whose median hash time stays within budget_ms.
+    """
+    timings = {}
+    recommended = min_rounds
+    for rounds in range(min_rounds, max_rounds + 1):
+        salt = bcrypt.gensalt(rounds=rounds)
+        durations = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            bcrypt.hashpw(b"calibration-password", salt)
+            durations.append((time.perf_counter() - start) * 1000)
+        timings[rounds] = sorted(durations)[len(durations) // 2]
+        if timings[rounds] > budget_ms:
+            break
+        recommended = rounds
+    return recommended, timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Password hashing tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    cal = sub.add_parser("calibrate", help="benchmark bcrypt costs against a latency budget")
+    cal.add_argument("--budget-ms", type=float, default=250.0,
+                     help="target time for one hash/verify in milliseconds (default 250)")
+    cal.add_argument("--max-rounds", type=int, default=16)
+    args = parser.parse_args(argv)
+
+    if args.command == "calibrate":
+        recommended, timings = calibrate(args.budget_ms, max_rounds=args.max_rounds)
+        for rounds, ms in timings.items():
+            print(f"  cost {rounds:2d}: {ms:8.1f} ms")
+        print(f"✅ Recommended: BCRYPT_ROUNDS={recommended} "
+              f"(budget {args.budget_ms:.0f} ms, current {BCRYPT_ROUNDS})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,11 @@
 # check_tables.py
-from sqlalchemy import create_engine, text
-from config.settings import POSTGRES_URL
+from sqlalchemy import text
+from db.database import get_engine
+from db.migrations import current_version, LATEST_VERSION
 
 def check_tables():
-    engine = create_engine(POSTGRES_URL)
+    engine = get_engine()
+    print(f"🗂️ Schema version: {current_version(engine)} (latest: {LATEST_VERSION})\n")
     
     with engine.connect() as conn:
         # Check if checkups table exists
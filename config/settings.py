@@ -13,11 +13,58 @@ SIDEBAR_TITLE = "🔑 Login"
 DB_FILE = "med_check.db"  # fallback SQLite (optional)
 USE_POSTGRES = True       # True to use Supabase/Postgres, False for local SQLite
 
-# --- Build Postgres URL from environment variables ---
-POSTGRES_URL = (
-    f"postgresql://{os.getenv('USER')}:{os.getenv('PASSWORD')}"
-    f"@{os.getenv('HOST')}:{os.getenv('PORT')}/{os.getenv('DBNAME')}?sslmode=require"
-)
+# --- Connection pool (one shared engine per process, see db/database.py) ---
+def _env_bool(name, default):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))                  # persistent connections kept open
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))           # extra connections allowed under burst
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))           # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))         # seconds before a connection is replaced
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)              # detect connections dropped by Supabase
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))  # 0 disables the timeout
+
+# --- Schema bootstrap (db/database.ensure_schema) ---
+AUTO_MIGRATE = _env_bool("AUTO_MIGRATE", False)    # migrate/seed on first page load instead of `python init_db.py`
+
+# --- Bulk insert ---
+DB_COPY_CHUNKSIZE = int(os.getenv("DB_COPY_CHUNKSIZE", "5000"))     # rows per COPY / executemany batch
+
+# --- Query result cache (db/cache.py) ---
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "256"))        # LRU bound
+QUERY_CACHE_TTL_SECONDS = float(os.getenv("QUERY_CACHE_TTL_SECONDS", "300"))      # bounds staleness from outside writes
+
+# --- Incremental refresh of the full checkups frame (db/queries.load_checkups) ---
+CHECKUP_DELTA_OVERLAP_SECONDS = int(os.getenv("CHECKUP_DELTA_OVERLAP_SECONDS", "30"))           # re-read window for late commits
+CHECKUP_TOMBSTONE_RETENTION_HOURS = int(os.getenv("CHECKUP_TOMBSTONE_RETENTION_HOURS", "24"))   # delete log kept this long
+
+# --- Health status backfill (db/backfill_status.py; rules live in the health_rules table) ---
+STATUS_BACKFILL_BATCH_SIZE = int(os.getenv("STATUS_BACKFILL_BATCH_SIZE", "5000"))
+
+# --- Streaming upload ingestion (db/ingest.py) ---
+UPLOAD_CHUNK_ROWS = int(os.getenv("UPLOAD_CHUNK_ROWS", "5000"))     # rows parsed, prepared and committed per transaction
+UPLOAD_ERROR_REPORT_LIMIT = int(os.getenv("UPLOAD_ERROR_REPORT_LIMIT", "1000"))  # validation errors shown per upload
+
+# --- Password hashing (auth/passwords.py) ---
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))              # cost for new hashes; calibrate with `python -m auth.passwords calibrate`
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(8, os.cpu_count() or 1))))  # threads for bcrypt work
+
+# --- QR image cache (utils/qr_cache.py) ---
+QR_CACHE_DIR = os.getenv("QR_CACHE_DIR", ".qr_cache")                                   # content-addressed PNGs
+QR_CACHE_MEMORY_BYTES = int(os.getenv("QR_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))   # in-process LRU bound
+QR_CACHE_DISK_BYTES = int(os.getenv("QR_CACHE_DISK_BYTES", str(256 * 1024 * 1024)))      # oldest files removed beyond this
+
+# --- Bulk QR rendering (utils/qr_batch.py) ---
+QR_RENDER_WORKERS = int(os.getenv("QR_RENDER_WORKERS", str(min(8, os.cpu_count() or 1))))  # worker processes
+QR_RENDER_BATCH = int(os.getenv("QR_RENDER_BATCH", "100"))                                 # codes per worker task
+
+# --- Printable QR badge sheets (utils/qr_sheets.py; rendered on the QR_RENDER_WORKERS pool) ---
+BADGE_SHEET_DPI = int(os.getenv("BADGE_SHEET_DPI", "200"))         # A4 = 1654 x 2339 px at 200 dpi
+BADGE_SHEET_COLUMNS = int(os.getenv("BADGE_SHEET_COLUMNS", "3"))   # badges per row
+BADGE_SHEET_ROWS = int(os.getenv("BADGE_SHEET_ROWS", "4"))         # badge rows per page
 
 # --- Default users (used if DB has no users) ---
 DEFAULT_USERS = [
@@ -0,0 +1,131 @@
+# db/backfill_status.py
+"""
+Recompute the stored checkups.status with the current health rules.
+
+Runs in batches ordered by checkup_id, one transaction per batch. Progress
+is kept in backfill_jobs under a fingerprint of the rules, so an
+interrupted run resumes where it stopped, a finished run is a no-op, and
+editing health_rules starts a fresh pass.
+
+CLI:
+    python -m db.backfill_status [--batch-size N] [--restart]
+"""
+import argparse
+import hashlib
+import json
+
+import pandas as pd
+from sqlalchemy import text
+
+from config.settings import STATUS_BACKFILL_BATCH_SIZE
+from utils.health import compute_status, rule_metrics, RULE_COLUMNS
+
+JOB_NAME = "checkup_status"
+
+
+def load_health_rules(conn) -> pd.DataFrame:
+    return pd.read_sql(
+        text(f"SELECT {', '.join(RULE_COLUMNS)} FROM health_rules ORDER BY rule_id"), conn
+    )
+
+
+def rules_fingerprint(rules: pd.DataFrame) -> str:
+    records = rules[RULE_COLUMNS].astype(object).where(rules[RULE_COLUMNS].notnull(), None)
+    payload = json.dumps(
+        sorted(records.to_dict("records"), key=lambda r: json.dumps(r, sort_keys=True, default=str)),
+        sort_keys=True, default=str
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def backfill_status(engine, rules=None, batch_size=STATUS_BACKFILL_BATCH_SIZE,
+                    restart=False, on_progress=None) -> int:
+    """
+    Recompute status for every checkup; returns the number of rows changed.
+    rules defaults to the current health_rules table.
+    on_progress(last_checkup_id) is called after each committed batch.
+    """
+    if rules is None:
+        with engine.connect() as conn:
+            rules = load_health_rules(conn)
+    fingerprint = rules_fingerprint(rules)
+    columns = ["checkup_id"] + rule_metrics(rules)
+    changed_total = 0
+
+    with engine.begin() as conn:
+        if restart:
+            conn.execute(
+                text("DELETE FROM backfill_jobs WHERE job = :job AND fingerprint = :fp"),
+                {"job": JOB_NAME, "fp": fingerprint}
+            )
+        conn.execute(
+            text("INSERT INTO backfill_jobs (job, fingerprint) VALUES (:job, :fp) "
+                 "ON CONFLICT (job, fingerprint) DO NOTHING"),
+            {"job": JOB_NAME, "fp": fingerprint}
+        )
+
+    while True:
+        with engine.begin() as conn:
+            job = conn.execute(
+                text("SELECT last_id, done FROM backfill_jobs "
+                     "WHERE job = :job AND fingerprint = :fp FOR UPDATE"),
+                {"job": JOB_NAME, "fp": fingerprint}
+            ).fetchone()
+            if job.done:
+                return changed_total
+
+            batch = pd.read_sql(
+                text(f"SELECT {', '.join(columns)} FROM checkups "
+                     "WHERE checkup_id > :last ORDER BY checkup_id LIMIT :n"),
+                conn, params={"last": job.last_id, "n": int(batch_size)}
+            )
+            if batch.empty:
+                conn.execute(
+                    text("UPDATE backfill_jobs SET done = TRUE, updated_at = NOW() "
+                         "WHERE job = :job AND fingerprint = :fp"),
+                    {"job": JOB_NAME, "fp": fingerprint}
+                )
+                return changed_total
+
+            statuses = compute_status(batch, rules)
+            result = conn.execute(
+                text("""
+                    UPDATE checkups c
+                    SET status = v.status
+                    FROM unnest(CAST(:ids AS integer[]), CAST(:statuses AS text[]))
+                         AS v(checkup_id, status)
+                    WHERE c.checkup_id = v.checkup_id
+                      AND c.status IS DISTINCT FROM v.status
+                """),
+                {"ids": batch["checkup_id"].astype(int).tolist(), "statuses": statuses.tolist()}
+            )
+            changed_total += result.rowcount
+
+            last_id = int(batch["checkup_id"].iloc[-1])
+            conn.execute(
+                text("UPDATE backfill_jobs SET last_id = :last, updated_at = NOW() "
+                     "WHERE job = :job AND fingerprint = :fp"),
+                {"last": last_id, "job": JOB_NAME, "fp": fingerprint}
+            )
+        if on_progress:
+            on_progress(last_id)
+
+
+def main(argv=None):
+    from db.database import get_engine
+
+    parser = argparse.ArgumentParser(description="Recompute stored checkup statuses")
+    parser.add_argument("--batch-size", type=int, default=STATUS_BACKFILL_BATCH_SIZE)
+    parser.add_argument("--restart", action="store_true",
+                        help="ignore saved progress for the current rules")
+    args = parser.parse_args(argv)
+
+    changed = backfill_status(
+        get_engine(), batch_size=args.batch_size, restart=args.restart,
+        on_progress=lambda last_id: print(f"  ... up to checkup_id {last_id}")
+    )
+    print(f"✅ Status backfill complete: {changed} checkup(s) updated.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# db/cache.py
+"""
+Process-wide result cache for the read functions in db.queries.
+
+Each cached read is keyed by its arguments plus the current version of
+every table it reads. Write functions bump those versions, so the next
+read misses and hits the database again. Reads between writes are served
+from memory for every Streamlit session in this server process.
+
+Writes made outside this process (SQL console, another server) are not
+seen until the entry expires (QUERY_CACHE_TTL_SECONDS).
+"""
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+import pandas as pd
+
+from config.settings import QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_TTL_SECONDS
+
+_lock = threading.RLock()
+_table_versions = {}
+_entries = OrderedDict()   # key -> (stored_at, value), oldest first
+
+
+def table_version(table: str) -> int:
+    with _lock:
+        return _table_versions.get(table, 0)
+
+
+def bump(*tables: str) -> None:
+    """Mark tables as changed; cached reads over them become stale."""
+    with _lock:
+        for table in tables:
+            _table_versions[table] = _table_versions.get(table, 0) + 1
+
+
+def clear() -> None:
+    with _lock:
+        _entries.clear()
+
+
+def _freeze(value):
+    """Turn call arguments into a hashable cache key part."""
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = sorted(value, key=repr) if isinstance(value, (set, frozenset)) else value
+        return tuple(_freeze(v) for v in items)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    hash(value)   # raises TypeError for unhashable arguments
+    return value
+
+
+def _copy(value):
+    """Callers mutate returned frames, so never hand out the cached object."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy()
+    if isinstance(value, (list, dict, set)):
+        return type(value)(value)
+    return value
+
+
+def cached_read(*tables: str):
+    """Memoise a read function; entries are invalidated by bump(*tables)."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                key = (func.__qualname__, _freeze(args), _freeze(kwargs),
+                       tuple(table_version(t) for t in tables))
+            except TypeError:
+                return func(*args, **kwargs)
+
+            now = time.monotonic()
+            with _lock:
+                entry = _entries.get(key)
+                if entry is not None and now - entry[0] < QUERY_CACHE_TTL_SECONDS:
+                    _entries.move_to_end(key)
+                    return _copy(entry[1])
+
+            value = func(*args, **kwargs)
+
+            with _lock:
+                _entries[key] = (now, value)
+                _entries.move_to_end(key)
+                while len(_entries) > QUERY_CACHE_MAX_ENTRIES:
+                    _entries.popitem(last=False)
+            return _copy(value)
+
+        wrapper.uncached = func
+        return wrapper
+    return decorator
+
+
+def invalidates(*tables: str):
+    """Bump the given table versions whenever the wrapped write function runs."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            finally:
+                bump(*tables)
+        return wrapper
+    return decorator
@@ -1,7 +1,12 @@
 # db/database.py
-import bcrypt
 from sqlalchemy import create_engine, text
-from config.settings import DEFAULT_USERS
+from sqlalchemy.engine import URL
+from config.settings import (
+    DEFAULT_USERS, AUTO_MIGRATE, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE, DB_POOL_PRE_PING, DB_STATEMENT_TIMEOUT_MS
+)
+from db.migrations import upgrade, current_version, LATEST_VERSION
+from db.backfill_status import backfill_status
 from dotenv import load_dotenv
 import os
 import streamlit as st
@@ -10,74 +15,96 @@ import streamlit as st
 load_dotenv(dotenv_path="supa.env")
 
 # --- Connection helper ---
+def _get_setting(key):
+    """Read a connection setting from Streamlit secrets, falling back to .env."""
+    try:
+        return st.secrets[key]
+    except Exception:
+        return os.getenv(key)
+
+@st.cache_resource(show_spinner=False)
 def get_engine():
-    """Return SQLAlchemy engine for Supabase PostgreSQL using .env or Streamlit secrets."""
-    user = os.getenv("USER") or st.secrets["USER"]
-    password = os.getenv("PASSWORD") or st.secrets["PASSWORD"]
-    host = os.getenv("HOST") or st.secrets["HOST"]
-    port = os.getenv("PORT") or st.secrets["PORT"]
-    dbname = os.getenv("DBNAME") or st.secrets["DBNAME"]
+    """
+    Return the process-wide SQLAlchemy engine for Supabase PostgreSQL.
+
+    Cached with st.cache_resource, so every rerun and every session on this
+    server share one connection pool instead of opening a new engine (and
+    TLS handshake) per call. Pool behaviour is configured in config/settings.py.
+    """
+    db_url = URL.create(
+        "postgresql+psycopg2",
+        username=_get_setting("USER"),
+        password=_get_setting("PASSWORD"),
+        host=_get_setting("HOST"),
+        port=int(_get_setting("PORT")),
+        database=_get_setting("DBNAME"),
+        query={"sslmode": "require"},
+    )
 
-    db_url = f"postgresql+psycopg2://{user}:{password}@{host}:{port}/{dbname}?sslmode=require"
-    return create_engine(db_url)
+    connect_args = {}
+    if DB_STATEMENT_TIMEOUT_MS > 0:
+        connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+
+    return create_engine(
+        db_url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        connect_args=connect_args,
+    )
 
 # --- Initialize DB ---
 def init_db():
-    """Initialize PostgreSQL database with required tables and default users."""
-    engine = get_engine()
-    with engine.connect() as conn:
-        # --- Create karyawan table (Manager master XLS) ---
-        conn.execute(text("""
-            CREATE TABLE IF NOT EXISTS karyawan (
-                uid UUID PRIMARY KEY,
-                username TEXT NOT NULL,
-                jabatan TEXT,
-                lokasi TEXT,
-                tanggal_lahir DATE
-            )
-        """))
-
-        # --- Create checkups table (Nurse master XLS) ---
-        conn.execute(text("""
-            CREATE TABLE IF NOT EXISTS checkups (
-                checkup_id SERIAL PRIMARY KEY,
-                uid UUID NOT NULL REFERENCES karyawan(uid) ON DELETE CASCADE,
-                tanggal DATE NOT NULL,
-                tanggal_lahir DATE,
-                umur INTEGER,
-                tinggi NUMERIC(5,2),
-                berat NUMERIC(5,2),
-                lingkar_perut NUMERIC(5,2),
-                bmi NUMERIC(5,2),
-                gestational_diabetes NUMERIC(5,2),
-                cholesterol NUMERIC(5,2),
-                asam_urat NUMERIC(5,2),
-                status VARCHAR(50)   -- Well/Unwell or any nurse status
-            )
-        """))
+    """
+    Apply pending schema migrations, make sure stored statuses match the
+    current health rules (no-op once done) and insert default users if none exist.
 
-        # --- Create users table ---
-        conn.execute(text("""
-            CREATE TABLE IF NOT EXISTS users (
-                id SERIAL PRIMARY KEY,
-                username VARCHAR(100) NOT NULL UNIQUE,
-                role VARCHAR(50) NOT NULL,
-                password TEXT,
-                created_at TIMESTAMP DEFAULT NOW()
-            )
-        """))
+    This is the explicit bootstrap step (`python init_db.py`); the app itself
+    only checks the schema version, see ensure_schema().
+    """
+    engine = get_engine()
+    upgrade(engine)
+    backfill_status(engine)
 
+    with engine.begin() as conn:
         # --- Insert default users if table empty ---
         result = conn.execute(text("SELECT COUNT(*) FROM users")).fetchone()
         if result[0] == 0:
-            for username, pw, role in DEFAULT_USERS:
-                hashed_pw = bcrypt.hashpw(pw.encode(), bcrypt.gensalt()).decode()
-                conn.execute(
-                    text(
-                        "INSERT INTO users (username, password, role) "
-                        "VALUES (:u, :p, :r)"
-                    ),
+            from auth.passwords import hash_passwords
+            hashes = hash_passwords(pw for _, pw, _ in DEFAULT_USERS)
+            conn.execute(
+                text(
+                    "INSERT INTO users (username, password, role) "
+                    "VALUES (:u, :p, :r)"
+                ),
+                [
                     {"u": username, "p": hashed_pw, "r": role}
-                )
+                    for (username, _, role), hashed_pw in zip(DEFAULT_USERS, hashes)
+                ]
+            )
 
-        conn.commit()
+# --- Schema check at app start ---
+@st.cache_resource(show_spinner=False)
+def ensure_schema() -> int:
+    """
+    Once per server process: make sure the database is at LATEST_VERSION.
+
+    Normally this is a single read of schema_version and no DDL; bootstrap
+    and upgrades are run explicitly with `python init_db.py`. With
+    AUTO_MIGRATE=true a behind (or empty) database is bootstrapped here
+    instead. Raises RuntimeError if the schema is behind and AUTO_MIGRATE is
+    off; failures are not cached, so the check runs again on the next page load.
+    """
+    engine = get_engine()
+    version = current_version(engine)
+    if version < LATEST_VERSION:
+        if not AUTO_MIGRATE:
+            raise RuntimeError(
+                f"Database schema is at version {version}, app needs {LATEST_VERSION}. "
+                "Run `python init_db.py` (or set AUTO_MIGRATE=true)."
+            )
+        init_db()
+        version = current_version(engine)
+    return version
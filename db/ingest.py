@@ -0,0 +1,281 @@
+# db/ingest.py
+"""
+Streaming ingestion of uploaded checkup / master karyawan files.
+
+The file is parsed UPLOAD_CHUNK_ROWS rows at a time (CSV via pandas chunks,
+XLSX via openpyxl read-only row iteration), and every chunk is prepared and
+written in its own transaction together with the progress of its upload job
+in the uploads table. Memory stays bounded by the chunk size.
+
+Jobs are keyed by a SHA-256 of the file content: a file that was already
+committed returns its ledger row without being parsed, and an interrupted
+import of the same file resumes after its last committed chunk.
+"""
+import hashlib
+import json
+import uuid
+
+import pandas as pd
+from sqlalchemy import text
+
+from config.settings import UPLOAD_CHUNK_ROWS, UPLOAD_ERROR_REPORT_LIMIT
+from db.database import get_engine
+from db.cache import bump
+from db.queries import insert_uploaded_checkups, merge_uploaded_karyawan
+from utils.validation import validate_uploaded_df, validate_uploaded_karyawan_df, ERROR_COLUMNS
+
+# Columns that mark a file as checkup data rather than a master roster
+MEDICAL_MARKERS = {
+    "tanggal", "tanggal_lahir", "tinggi", "berat",
+    "lingkar_perut", "bmi", "gestational_diabetes",
+    "cholesterol", "asam_urat", "umur"
+}
+
+
+class EmptyUploadError(ValueError):
+    """The uploaded file has a header but no data rows."""
+
+
+def detect_upload_kind(columns) -> str:
+    cols_lower = {str(c).strip().lower() for c in columns}
+    return "checkups" if cols_lower & MEDICAL_MARKERS else "karyawan"
+
+
+def _file_size(file):
+    try:
+        pos = file.tell()
+        size = file.seek(0, 2)
+        file.seek(pos)
+        return size or None
+    except (AttributeError, OSError):
+        return None
+
+
+def _iter_xlsx_chunks(file, chunk_rows):
+    """Yield (frame, fraction_read) from the first sheet without loading it whole."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        total_rows = sheet.max_row
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = [str(h) if h is not None else f"column_{i}" for i, h in enumerate(header)]
+
+        # Frame index = 0-based data row, so validation errors name the sheet row
+        batch, index, seen = [], [], 1
+        for row in rows:
+            seen += 1
+            if all(v is None for v in row):
+                continue
+            batch.append(row[:len(header)])
+            index.append(seen - 2)
+            if len(batch) >= chunk_rows:
+                yield pd.DataFrame.from_records(batch, columns=header, index=index), \
+                    (seen / total_rows if total_rows else None)
+                batch, index = [], []
+        if batch:
+            yield pd.DataFrame.from_records(batch, columns=header, index=index), 1.0
+    finally:
+        workbook.close()
+
+
+def iter_upload_chunks(file, filename, chunk_rows=UPLOAD_CHUNK_ROWS):
+    """
+    Yield (frame, fraction_read) chunks of an uploaded CSV/XLSX/XLS file.
+    fraction_read is the approximate share of the file consumed so far
+    (None when unknown).
+    """
+    name = filename.lower()
+    if name.endswith(".csv"):
+        size = _file_size(file)
+        for chunk in pd.read_csv(file, chunksize=chunk_rows):
+            yield chunk, (min(file.tell() / size, 1.0) if size else None)
+    elif name.endswith(".xlsx"):
+        yield from _iter_xlsx_chunks(file, chunk_rows)
+    else:
+        # Legacy .xls has no streaming reader; parse once and slice
+        frame = pd.read_excel(file)
+        for start in range(0, len(frame), chunk_rows):
+            yield frame.iloc[start:start + chunk_rows], min((start + chunk_rows) / len(frame), 1.0)
+
+
+def content_hash(file, block_size=1 << 20) -> str:
+    """SHA-256 of a file-like object's content; leaves it rewound to the start."""
+    digest = hashlib.sha256()
+    file.seek(0)
+    for block in iter(lambda: file.read(block_size), b""):
+        digest.update(block)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def find_upload(file_hash):
+    """
+    Ledger row for a content hash as a dict, or None: the committed import
+    if there is one (unique index lookup), else the latest unfinished one.
+    """
+    with get_engine().connect() as conn:
+        row = conn.execute(
+            text("""
+                SELECT * FROM uploads
+                WHERE content_hash = :hash
+                ORDER BY (status = 'committed') DESC, updated_at DESC
+                LIMIT 1
+            """),
+            {"hash": file_hash}
+        ).mappings().fetchone()
+    return dict(row) if row else None
+
+
+def get_upload(upload_id):
+    """The uploads row for upload_id as a dict, or None."""
+    with get_engine().connect() as conn:
+        row = conn.execute(
+            text("SELECT * FROM uploads WHERE upload_id = :id"), {"id": str(upload_id)}
+        ).mappings().fetchone()
+    return dict(row) if row else None
+
+
+def _merge_counts(total, counts):
+    for key, value in counts.items():
+        total[key] = total.get(key, 0) + value
+    return total
+
+
+def ingest_upload(file, filename, chunk_rows=UPLOAD_CHUNK_ROWS, on_progress=None) -> dict:
+    """
+    Import an uploaded file chunk by chunk, at most once per file content.
+
+    on_progress(rows_committed, fraction_read) is called after every chunk.
+
+    Returns the job dict (upload_id, kind, status, rows_committed, result, ...)
+    plus "duplicate": True when the same content was already committed, in
+    which case nothing is read or written. result holds {"saved": n,
+    "rejected": n} for checkups or inserted/updated/unchanged counts for a
+    master roster (plus "rejected"). Rows failing utils.validation are
+    skipped; the first UPLOAD_ERROR_REPORT_LIMIT failures are returned under
+    "errors" (row, column, reason, value).
+    Raises ValueError for missing columns, EmptyUploadError (a ValueError)
+    for a file without data rows, RuntimeError while another session is
+    importing the same file.
+    """
+    engine = get_engine()
+    file_hash = content_hash(file)
+    job = find_upload(file_hash)
+    if job and job["status"] == "committed":
+        return {**job, "duplicate": True, "errors": pd.DataFrame(columns=ERROR_COLUMNS)}
+
+    # Serialise imports of the same content across sessions and servers
+    lock_conn = engine.connect()
+    lock_key = {"key": file_hash}
+    acquired = lock_conn.execute(
+        text("SELECT pg_try_advisory_lock(hashtextextended(:key, 0))"), lock_key
+    ).scalar()
+    lock_conn.commit()   # session-level lock; do not sit idle in a transaction
+    if not acquired:
+        lock_conn.close()
+        raise RuntimeError("File yang sama sedang diproses di sesi lain.")
+
+    try:
+        return _ingest_locked(engine, file, filename, file_hash, chunk_rows, on_progress)
+    finally:
+        lock_conn.execute(text("SELECT pg_advisory_unlock(hashtextextended(:key, 0))"), lock_key)
+        lock_conn.commit()
+        lock_conn.close()
+
+
+def _ingest_locked(engine, file, filename, file_hash, chunk_rows, on_progress) -> dict:
+    # Re-read under the lock: another session may have finished meanwhile
+    job = find_upload(file_hash)
+    if job and job["status"] == "committed":
+        return {**job, "duplicate": True, "errors": pd.DataFrame(columns=ERROR_COLUMNS)}
+
+    upload_id = str(job["upload_id"]) if job else str(uuid.uuid4())
+    skip = job["rows_committed"] if job else 0
+    result = dict(job["result"]) if job else {}
+    kind = job["kind"] if job else None
+    rows_read = 0
+    errors = []
+    errors_kept = 0
+
+    try:
+        for chunk, fraction in iter_upload_chunks(file, filename, chunk_rows):
+            chunk_start = rows_read
+            rows_read += len(chunk)
+            if rows_read <= skip:
+                continue
+            if chunk_start < skip:
+                chunk = chunk.iloc[skip - chunk_start:]
+
+            if kind is None:
+                kind = detect_upload_kind(chunk.columns)
+            if kind == "checkups":
+                prepared, chunk_errors = validate_uploaded_df(chunk)
+            else:
+                prepared, chunk_errors = validate_uploaded_karyawan_df(chunk)
+            if errors_kept < UPLOAD_ERROR_REPORT_LIMIT and not chunk_errors.empty:
+                errors.append(chunk_errors.head(UPLOAD_ERROR_REPORT_LIMIT - errors_kept))
+                errors_kept += len(errors[-1])
+            rejected = len(chunk) - len(prepared)
+
+            with engine.begin() as conn:
+                if job is None:
+                    conn.execute(
+                        text("INSERT INTO uploads (upload_id, filename, kind, content_hash) "
+                             "VALUES (:id, :name, :kind, :hash)"),
+                        {"id": upload_id, "name": filename, "kind": kind, "hash": file_hash}
+                    )
+                    job = {"upload_id": upload_id}
+                if kind == "checkups":
+                    counts = {
+                        "saved": insert_uploaded_checkups(conn, prepared, upload_id) if len(prepared) else 0,
+                        "rejected": rejected,
+                    }
+                else:
+                    counts = {**merge_uploaded_karyawan(conn, prepared, upload_id), "rejected": rejected}
+                _merge_counts(result, counts)
+                conn.execute(
+                    text("""
+                        UPDATE uploads
+                        SET rows_committed = rows_committed + :n,
+                            chunks_committed = chunks_committed + 1,
+                            result = CAST(:result AS jsonb),
+                            status = 'running',
+                            error = NULL,
+                            updated_at = NOW()
+                        WHERE upload_id = :id
+                    """),
+                    {"n": len(chunk), "result": json.dumps(result), "id": upload_id}
+                )
+            skip = rows_read
+            if on_progress:
+                on_progress(rows_read, fraction)
+
+        if job is None:
+            # Nothing was read, so no job row exists; do not record an empty import
+            raise EmptyUploadError(f"File '{filename}' tidak berisi baris data.")
+        with engine.begin() as conn:
+            conn.execute(
+                text("UPDATE uploads SET status = 'committed', finished_at = NOW(), "
+                     "updated_at = NOW() WHERE upload_id = :id"),
+                {"id": upload_id}
+            )
+    except Exception as e:
+        if job is not None:
+            with engine.begin() as conn:
+                conn.execute(
+                    text("UPDATE uploads SET status = 'failed', error = :error, "
+                         "updated_at = NOW() WHERE upload_id = :id"),
+                    {"error": str(e), "id": upload_id}
+                )
+        raise
+    finally:
+        bump("checkups", "karyawan")
+
+    job = get_upload(upload_id)
+    errors = pd.concat(errors, ignore_index=True) if errors else pd.DataFrame(columns=ERROR_COLUMNS)
+    return {**job, "duplicate": False, "errors": errors}
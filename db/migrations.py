@@ -0,0 +1,414 @@
+# db/migrations.py
+"""
+Versioned schema migrations for the Mini MCU database.
+
+Every migration is an ordered list of idempotent SQL statements; applied
+versions are recorded in the schema_version table, so running upgrade()
+again only applies what is missing.
+
+Requires PostgreSQL 15 or newer (migration 2 uses NULLS NOT DISTINCT and
+checks the server version before anything else).
+
+CLI:
+    python -m db.migrations upgrade [--target N]   # apply pending migrations
+    python -m db.migrations current                # print the applied version
+    python -m db.migrations status                 # list applied/pending migrations
+"""
+import argparse
+from sqlalchemy import text
+
+# Arbitrary key for pg_advisory_xact_lock, so two app instances never migrate at once
+MIGRATION_LOCK_ID = 482_771_001
+
+# --- Migrations: (version, description, [statements]) ---
+MIGRATIONS = [
+    (1, "base tables: karyawan, checkups, users", [
+        """
+        CREATE TABLE IF NOT EXISTS karyawan (
+            uid UUID PRIMARY KEY,
+            username TEXT NOT NULL,
+            jabatan TEXT,
+            lokasi TEXT,
+            tanggal_lahir DATE,
+            uploaded_at TIMESTAMP DEFAULT NOW(),
+            upload_batch_id UUID
+        )
+        """,
+        # Databases created by the old init_db() lack the upload columns
+        "ALTER TABLE karyawan ADD COLUMN IF NOT EXISTS uploaded_at TIMESTAMP DEFAULT NOW()",
+        "ALTER TABLE karyawan ADD COLUMN IF NOT EXISTS upload_batch_id UUID",
+        """
+        CREATE TABLE IF NOT EXISTS checkups (
+            checkup_id SERIAL PRIMARY KEY,
+            uid UUID NOT NULL REFERENCES karyawan(uid) ON DELETE CASCADE,
+            tanggal DATE NOT NULL,
+            tanggal_lahir DATE,
+            umur INTEGER,
+            tinggi NUMERIC(5,2),
+            berat NUMERIC(5,2),
+            lingkar_perut NUMERIC(5,2),
+            bmi NUMERIC(5,2),
+            gestational_diabetes NUMERIC(5,2),
+            cholesterol NUMERIC(5,2),
+            asam_urat NUMERIC(5,2),
+            status VARCHAR(50)   -- Well/Unwell or any nurse status
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id SERIAL PRIMARY KEY,
+            username VARCHAR(100) NOT NULL UNIQUE,
+            role VARCHAR(50) NOT NULL,
+            password TEXT,
+            created_at TIMESTAMP DEFAULT NOW()
+        )
+        """,
+    ]),
+    (2, "karyawan identity key for bulk uploads", [
+        """
+        DO $$
+        BEGIN
+            IF current_setting('server_version_num')::int < 150000 THEN
+                RAISE EXCEPTION 'Mini MCU needs PostgreSQL 15 or newer (found %)',
+                    current_setting('server_version');
+            END IF;
+        END
+        $$
+        """,
+        # Rows added before this key may repeat an identity (the old lookup
+        # never matched NULL jabatan/lokasi). Keep the oldest row of each
+        # identity, move the others' checkups (and a missing birth date) to it.
+        """
+        CREATE TEMP TABLE karyawan_identity_merge ON COMMIT DROP AS
+        SELECT uid, tanggal_lahir, keep_uid
+        FROM (
+            SELECT uid, tanggal_lahir,
+                   FIRST_VALUE(uid) OVER (
+                       PARTITION BY username, jabatan, lokasi
+                       ORDER BY uploaded_at NULLS LAST, uid
+                   ) AS keep_uid
+            FROM karyawan
+        ) ranked
+        WHERE uid <> keep_uid
+        """,
+        """
+        UPDATE checkups c
+        SET uid = m.keep_uid
+        FROM karyawan_identity_merge m
+        WHERE c.uid = m.uid
+        """,
+        """
+        UPDATE karyawan k
+        SET tanggal_lahir = m.tanggal_lahir
+        FROM (
+            SELECT keep_uid, MAX(tanggal_lahir) AS tanggal_lahir
+            FROM karyawan_identity_merge
+            GROUP BY keep_uid
+        ) m
+        WHERE k.uid = m.keep_uid AND k.tanggal_lahir IS NULL AND m.tanggal_lahir IS NOT NULL
+        """,
+        "DELETE FROM karyawan k USING karyawan_identity_merge m WHERE k.uid = m.uid",
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_karyawan_identity
+        ON karyawan (username, jabatan, lokasi) NULLS NOT DISTINCT
+        """,
+    ]),
+    (3, "latest checkup per employee, trigger-maintained", [
+        """
+        CREATE TABLE IF NOT EXISTS latest_checkups (
+            uid UUID PRIMARY KEY REFERENCES karyawan(uid) ON DELETE CASCADE,
+            checkup_id INTEGER NOT NULL,
+            tanggal DATE NOT NULL
+        )
+        """,
+        """
+        CREATE OR REPLACE FUNCTION refresh_latest_checkup(p_uid UUID) RETURNS void AS $$
+        BEGIN
+            DELETE FROM latest_checkups WHERE uid = p_uid;
+            INSERT INTO latest_checkups (uid, checkup_id, tanggal)
+            SELECT uid, checkup_id, tanggal
+            FROM checkups
+            WHERE uid = p_uid
+            ORDER BY tanggal DESC, checkup_id DESC
+            LIMIT 1;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        """
+        CREATE OR REPLACE FUNCTION checkups_latest_trigger() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO latest_checkups (uid, checkup_id, tanggal)
+                VALUES (NEW.uid, NEW.checkup_id, NEW.tanggal)
+                ON CONFLICT (uid) DO UPDATE
+                SET checkup_id = EXCLUDED.checkup_id, tanggal = EXCLUDED.tanggal
+                WHERE (EXCLUDED.tanggal, EXCLUDED.checkup_id)
+                    > (latest_checkups.tanggal, latest_checkups.checkup_id);
+            ELSE
+                PERFORM refresh_latest_checkup(OLD.uid);
+                IF TG_OP = 'UPDATE' AND NEW.uid IS DISTINCT FROM OLD.uid THEN
+                    PERFORM refresh_latest_checkup(NEW.uid);
+                END IF;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        "DROP TRIGGER IF EXISTS trg_checkups_latest ON checkups",
+        """
+        CREATE TRIGGER trg_checkups_latest
+        AFTER INSERT OR UPDATE OR DELETE ON checkups
+        FOR EACH ROW EXECUTE FUNCTION checkups_latest_trigger()
+        """,
+        # Backfill employees whose history predates the trigger
+        """
+        INSERT INTO latest_checkups (uid, checkup_id, tanggal)
+        SELECT DISTINCT ON (uid) uid, checkup_id, tanggal
+        FROM checkups
+        ORDER BY uid, tanggal DESC, checkup_id DESC
+        ON CONFLICT (uid) DO NOTHING
+        """,
+    ]),
+    (4, "secondary indexes for hot queries", [
+        # Per-employee history (QR landing page, nurse edit tab, latest-in-window)
+        "CREATE INDEX IF NOT EXISTS idx_checkups_uid_tanggal ON checkups (uid, tanggal DESC)",
+        # Month/year/date-range dashboard filters
+        "CREATE INDEX IF NOT EXISTS idx_checkups_tanggal ON checkups (tanggal)",
+        # Upload history and delete_batch()
+        "CREATE INDEX IF NOT EXISTS idx_karyawan_upload_batch_id ON karyawan (upload_batch_id)",
+        # Roster merge fallback and get_employees() ordering
+        "CREATE INDEX IF NOT EXISTS idx_karyawan_username ON karyawan (username)",
+        # count_users_by_role()
+        "CREATE INDEX IF NOT EXISTS idx_users_role ON users (role)",
+    ]),
+    (5, "checkup change tracking for incremental refresh", [
+        # Existing rows get NOW(); new/updated rows get the real write time
+        "ALTER TABLE checkups ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()",
+        "ALTER TABLE checkups ALTER COLUMN updated_at SET DEFAULT clock_timestamp()",
+        "CREATE INDEX IF NOT EXISTS idx_checkups_updated_at ON checkups (updated_at)",
+        """
+        CREATE OR REPLACE FUNCTION checkups_touch_updated_at() RETURNS trigger AS $$
+        BEGIN
+            NEW.updated_at := clock_timestamp();
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        "DROP TRIGGER IF EXISTS trg_checkups_touch ON checkups",
+        """
+        CREATE TRIGGER trg_checkups_touch
+        BEFORE UPDATE ON checkups
+        FOR EACH ROW EXECUTE FUNCTION checkups_touch_updated_at()
+        """,
+        # Tombstone log of deleted checkups (including karyawan cascades)
+        """
+        CREATE TABLE IF NOT EXISTS checkup_tombstones (
+            checkup_id INTEGER PRIMARY KEY,
+            deleted_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp()
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_checkup_tombstones_deleted_at ON checkup_tombstones (deleted_at)",
+        """
+        CREATE OR REPLACE FUNCTION checkups_tombstone_trigger() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO checkup_tombstones (checkup_id, deleted_at)
+            VALUES (OLD.checkup_id, clock_timestamp())
+            ON CONFLICT (checkup_id) DO UPDATE SET deleted_at = EXCLUDED.deleted_at;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        "DROP TRIGGER IF EXISTS trg_checkups_tombstone ON checkups",
+        """
+        CREATE TRIGGER trg_checkups_tombstone
+        AFTER DELETE ON checkups
+        FOR EACH ROW EXECUTE FUNCTION checkups_tombstone_trigger()
+        """,
+    ]),
+    (6, "keyset pagination index for the latest-checkup history table", [
+        """
+        CREATE INDEX IF NOT EXISTS idx_latest_checkups_tanggal_id
+        ON latest_checkups (tanggal DESC, checkup_id DESC)
+        """,
+    ]),
+    (7, "stored health status: index and resumable backfill state", [
+        "CREATE INDEX IF NOT EXISTS idx_checkups_status ON checkups (status)",
+        """
+        CREATE TABLE IF NOT EXISTS backfill_jobs (
+            job TEXT NOT NULL,
+            fingerprint TEXT NOT NULL,
+            last_id INTEGER NOT NULL DEFAULT 0,
+            done BOOLEAN NOT NULL DEFAULT FALSE,
+            updated_at TIMESTAMPTZ DEFAULT NOW(),
+            PRIMARY KEY (job, fingerprint)
+        )
+        """,
+        # Status-only updates (backfill, edits) must not rebuild latest_checkups
+        """
+        CREATE OR REPLACE FUNCTION checkups_latest_trigger() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO latest_checkups (uid, checkup_id, tanggal)
+                VALUES (NEW.uid, NEW.checkup_id, NEW.tanggal)
+                ON CONFLICT (uid) DO UPDATE
+                SET checkup_id = EXCLUDED.checkup_id, tanggal = EXCLUDED.tanggal
+                WHERE (EXCLUDED.tanggal, EXCLUDED.checkup_id)
+                    > (latest_checkups.tanggal, latest_checkups.checkup_id);
+            ELSIF TG_OP = 'UPDATE' AND NEW.uid = OLD.uid AND NEW.tanggal = OLD.tanggal THEN
+                RETURN NULL;
+            ELSE
+                PERFORM refresh_latest_checkup(OLD.uid);
+                IF TG_OP = 'UPDATE' AND NEW.uid IS DISTINCT FROM OLD.uid THEN
+                    PERFORM refresh_latest_checkup(NEW.uid);
+                END IF;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+    ]),
+    (8, "configurable health rules", [
+        """
+        CREATE TABLE IF NOT EXISTS health_rules (
+            rule_id SERIAL PRIMARY KEY,
+            metric TEXT NOT NULL CHECK (metric IN (
+                'bmi', 'gestational_diabetes', 'cholesterol', 'asam_urat',
+                'lingkar_perut', 'tinggi', 'berat'
+            )),
+            sex CHAR(1) CHECK (sex IN ('L', 'P')),
+            age_min INTEGER,
+            age_max INTEGER,
+            min_value NUMERIC(7,2),
+            max_value NUMERIC(7,2),
+            CHECK (min_value IS NOT NULL OR max_value IS NOT NULL),
+            CHECK (age_min IS NULL OR age_max IS NULL OR age_min <= age_max)
+        )
+        """,
+        # Seed with the thresholds the app used before rules were configurable
+        """
+        INSERT INTO health_rules (metric, max_value)
+        SELECT v.metric, v.max_value
+        FROM (VALUES
+            ('bmi', 30),
+            ('gestational_diabetes', 120),
+            ('cholesterol', 240),
+            ('asam_urat', 7)
+        ) AS v(metric, max_value)
+        WHERE NOT EXISTS (SELECT 1 FROM health_rules)
+        """,
+    ]),
+    (9, "upload job ledger for streaming, resumable imports", [
+        """
+        CREATE TABLE IF NOT EXISTS uploads (
+            upload_id UUID PRIMARY KEY,
+            filename TEXT NOT NULL,
+            kind TEXT NOT NULL CHECK (kind IN ('checkups', 'karyawan')),
+            status TEXT NOT NULL DEFAULT 'running'
+                CHECK (status IN ('running', 'committed', 'failed')),
+            rows_committed INTEGER NOT NULL DEFAULT 0,
+            chunks_committed INTEGER NOT NULL DEFAULT 0,
+            result JSONB NOT NULL DEFAULT '{}'::jsonb,
+            error TEXT,
+            started_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            finished_at TIMESTAMPTZ
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_uploads_started_at ON uploads (started_at DESC)",
+    ]),
+    (10, "content hash on the upload ledger; one committed import per file", [
+        "ALTER TABLE uploads ADD COLUMN IF NOT EXISTS content_hash TEXT",
+        "CREATE INDEX IF NOT EXISTS idx_uploads_content_hash ON uploads (content_hash)",
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_uploads_committed_hash
+        ON uploads (content_hash) WHERE status = 'committed'
+        """,
+    ]),
+    (11, "drop health_rules.sex (checkups carry no sex to match on)", [
+        "ALTER TABLE health_rules DROP COLUMN IF EXISTS sex",
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def _ensure_version_table(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT NOW()
+        )
+    """))
+
+
+def _applied_versions(conn):
+    rows = conn.execute(text("SELECT version FROM schema_version")).fetchall()
+    return {row[0] for row in rows}
+
+
+def current_version(engine) -> int:
+    """Highest applied migration version (0 for an empty database). Read-only, no DDL."""
+    with engine.connect() as conn:
+        if conn.execute(text("SELECT to_regclass('schema_version')")).scalar() is None:
+            return 0
+        version = conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar()
+    return version or 0
+
+
+def upgrade(engine, target=None) -> list:
+    """
+    Apply pending migrations in order, each in its own transaction.
+    Returns the list of versions applied by this call.
+    """
+    applied_now = []
+    for version, description, statements in MIGRATIONS:
+        if target is not None and version > target:
+            break
+        with engine.begin() as conn:
+            conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+            _ensure_version_table(conn)
+            if version in _applied_versions(conn):
+                continue
+            for statement in statements:
+                conn.execute(text(statement))
+            conn.execute(
+                text("INSERT INTO schema_version (version, description) VALUES (:v, :d)"),
+                {"v": version, "d": description}
+            )
+        applied_now.append(version)
+    return applied_now
+
+
+def main(argv=None):
+    from db.database import get_engine
+
+    parser = argparse.ArgumentParser(description="Mini MCU schema migrations")
+    sub = parser.add_subparsers(dest="command", required=True)
+    up = sub.add_parser("upgrade", help="apply pending migrations")
+    up.add_argument("--target", type=int, default=None, help="stop after this version")
+    sub.add_parser("current", help="print the applied schema version")
+    sub.add_parser("status", help="list applied and pending migrations")
+    args = parser.parse_args(argv)
+
+    engine = get_engine()
+    if args.command == "upgrade":
+        applied = upgrade(engine, target=args.target)
+        if applied:
+            print(f"✅ Applied migrations: {', '.join(map(str, applied))}")
+        else:
+            print("✅ Schema already up to date.")
+        print(f"Schema version: {current_version(engine)}")
+    elif args.command == "current":
+        print(current_version(engine))
+    else:
+        with engine.begin() as conn:
+            _ensure_version_table(conn)
+            applied = _applied_versions(conn)
+        for version, description, _ in MIGRATIONS:
+            mark = "applied" if version in applied else "pending"
+            print(f"{version:>3}  {mark:<8} {description}")
+
+
+if __name__ == "__main__":
+    main()
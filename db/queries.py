@@ -1,21 +1,23 @@
 # db/queries.py
 import pandas as pd
-import bcrypt
+import io
+import csv
+import json
+import time
 import uuid
-from sqlalchemy import create_engine, text
+import threading
+from datetime import date, timedelta
+from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
-from utils.helpers import calculate_age
-import streamlit as st
-
-# --- Config (patched to use Streamlit secrets) ---
-USER = st.secrets["USER"]
-PASSWORD = st.secrets["PASSWORD"]
-HOST = st.secrets["HOST"]
-PORT = st.secrets["PORT"]
-DBNAME = st.secrets["DBNAME"]
-
-DATABASE_URL = f"postgresql://{USER}:{PASSWORD}@{HOST}:{PORT}/{DBNAME}?sslmode=require"
-ENGINE = create_engine(DATABASE_URL)
+from utils.helpers import calculate_age_series
+from utils.health import compute_status, RULE_COLUMNS
+from db.database import get_engine
+from db.cache import cached_read, invalidates, table_version
+from db.backfill_status import load_health_rules
+from config.settings import (
+    DB_COPY_CHUNKSIZE, QUERY_CACHE_TTL_SECONDS,
+    CHECKUP_DELTA_OVERLAP_SECONDS, CHECKUP_TOMBSTONE_RETENTION_HOURS
+)
 
 # --- Expected schema for checkups table ---
 CHECKUP_COLUMNS = [
@@ -24,11 +26,8 @@ CHECKUP_COLUMNS = [
     "bmi", "gestational_diabetes", "cholesterol", "asam_urat"
 ]
 
-# --- Connection helper ---
-def get_engine():
-    return ENGINE
-
 # --- Karyawan ---
+@cached_read("karyawan")
 def get_employees():
     query = """
         SELECT uid, username AS nama, jabatan, lokasi, tanggal_lahir
@@ -37,6 +36,7 @@ def get_employees():
     """
     return pd.read_sql(query, get_engine())
 
+@cached_read("karyawan")
 def get_employee_by_uid(uid):
     with get_engine().connect() as conn:
         result = conn.execute(
@@ -48,6 +48,7 @@ def get_employee_by_uid(uid):
         ).fetchone()
     return dict(result._mapping) if result else None
 
+@invalidates("karyawan")
 def add_employee_if_missing(username, jabatan, lokasi, tanggal_lahir=None, upload_batch_id=None):
     with get_engine().begin() as conn:
         existing = conn.execute(
@@ -79,40 +80,502 @@ def add_employee_if_missing(username, jabatan, lokasi, tanggal_lahir=None, uploa
         return new_uid
 
 # --- Checkups ---
-def load_checkups():
-    query = """
+# Status is computed once at write time (utils.health) and stored/indexed
+STATUS_SQL = "c.status"
+STATUS_OPTIONS = ["Well", "Unwell"]
+
+# Output column -> SQL expression, used for projection in query_checkups()
+CHECKUP_SELECT = {
+    "checkup_id": "c.checkup_id",
+    "uid": "c.uid",
+    "tanggal": "c.tanggal",
+    "tanggal_lahir": "c.tanggal_lahir",
+    "umur": "c.umur",
+    "tinggi": "ROUND(c.tinggi::numeric, 2)",
+    "berat": "ROUND(c.berat::numeric, 2)",
+    "lingkar_perut": "ROUND(c.lingkar_perut::numeric, 2)",
+    "bmi": "ROUND(c.bmi::numeric, 2)",
+    "gestational_diabetes": "c.gestational_diabetes",
+    "cholesterol": "c.cholesterol",
+    "asam_urat": "c.asam_urat",
+    "status": STATUS_SQL,
+    "nama": "k.username",
+    "jabatan": "k.jabatan",
+    "lokasi": "k.lokasi",
+    "updated_at": "c.updated_at",
+}
+
+# Columns returned by load_checkups() (full history export)
+LOAD_CHECKUP_COLUMNS = [
+    "uid", "tanggal", "tanggal_lahir", "umur",
+    "tinggi", "berat", "lingkar_perut", "bmi",
+    "gestational_diabetes", "cholesterol", "asam_urat",
+    "nama", "jabatan", "lokasi"
+]
+
+def _checkup_filters(date_from=None, date_to=None, year=None, month=None,
+                     lokasi=None, uid=None, status=None):
+    """
+    Compile dashboard filters into SQL WHERE clauses and bind parameters.
+
+    None means "no filter"; an empty list for lokasi/status matches nothing.
+    Year (and year+month) filters become a date range so the planner can
+    use an index on tanggal.
+    """
+    clauses, params = [], {}
+
+    if date_from is not None:
+        clauses.append("c.tanggal >= :date_from")
+        params["date_from"] = date_from
+    if date_to is not None:
+        clauses.append("c.tanggal <= :date_to")
+        params["date_to"] = date_to
+
+    if year:
+        if month:
+            start = date(int(year), int(month), 1)
+            end = date(int(year) + 1, 1, 1) if int(month) == 12 else date(int(year), int(month) + 1, 1)
+        else:
+            start, end = date(int(year), 1, 1), date(int(year) + 1, 1, 1)
+        clauses.append("c.tanggal >= :period_start AND c.tanggal < :period_end")
+        params["period_start"], params["period_end"] = start, end
+    elif month:
+        clauses.append("EXTRACT(MONTH FROM c.tanggal) = :month")
+        params["month"] = int(month)
+
+    if lokasi is not None:
+        clauses.append("k.lokasi = ANY(:lokasi)")
+        params["lokasi"] = list(lokasi)
+    if uid is not None:
+        clauses.append("c.uid = :uid")
+        params["uid"] = str(uid)
+    if status is not None:
+        clauses.append(f"{STATUS_SQL} = ANY(:status)")
+        params["status"] = list(status)
+
+    return clauses, params
+
+def _select_sql(columns=None):
+    """Compile a projection (CHECKUP_SELECT keys) into a SELECT list."""
+    columns = list(columns or LOAD_CHECKUP_COLUMNS)
+    unknown = [col for col in columns if col not in CHECKUP_SELECT]
+    if unknown:
+        raise ValueError(f"Unknown checkup columns: {unknown}")
+    return ",\n            ".join(f"{CHECKUP_SELECT[col]} AS {col}" for col in columns)
+
+@cached_read("checkups", "karyawan")
+def query_checkups(columns=None, date_from=None, date_to=None, year=None, month=None,
+                   lokasi=None, uid=None, status=None, limit=None) -> pd.DataFrame:
+    """
+    Load checkups joined to karyawan, newest first, with filters and column
+    selection applied in Postgres so only the needed rows/columns are sent.
+
+    columns: subset of CHECKUP_SELECT keys (default: LOAD_CHECKUP_COLUMNS)
+    """
+    select_sql = _select_sql(columns)
+    clauses, params = _checkup_filters(date_from, date_to, year, month, lokasi, uid, status)
+    where_sql = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    limit_sql = ""
+    if limit is not None:
+        limit_sql = "LIMIT :limit"
+        params["limit"] = int(limit)
+
+    query = f"""
         SELECT
-            c.uid,
-            c.tanggal,
-            c.tanggal_lahir,
-            c.umur,
-            ROUND(c.tinggi::numeric, 2) AS tinggi,
-            ROUND(c.berat::numeric, 2) AS berat,
-            ROUND(c.lingkar_perut::numeric, 2) AS lingkar_perut,
-            ROUND(c.bmi::numeric, 2) AS bmi,
-            c.gestational_diabetes,
-            c.cholesterol,
-            c.asam_urat,
-            k.username AS nama,
-            k.jabatan,
-            k.lokasi
+            {select_sql}
         FROM checkups c
         JOIN karyawan k ON c.uid = k.uid
+        {where_sql}
         ORDER BY c.tanggal DESC
+        {limit_sql}
+    """
+    return pd.read_sql(text(query), get_engine(), params=params)
+
+def _latest_checkups_from(date_from=None, date_to=None, year=None, month=None,
+                          lokasi=None, status=None):
+    """
+    FROM/WHERE for "latest checkup per employee" queries, aliased l/c/k.
+
+    Without a date window this is the trigger-maintained latest_checkups
+    table; with one, the latest checkup inside the window is picked with
+    DISTINCT ON (idx_checkups_uid_tanggal). lokasi/status filters apply to
+    that latest checkup.
+    """
+    date_clauses, params = _checkup_filters(date_from, date_to, year, month)
+    if date_clauses:
+        latest_sql = f"""(
+            SELECT DISTINCT ON (c.uid) c.checkup_id, c.tanggal
+            FROM checkups c
+            WHERE {' AND '.join(date_clauses)}
+            ORDER BY c.uid, c.tanggal DESC, c.checkup_id DESC
+        )"""
+    else:
+        latest_sql = "latest_checkups"
+
+    clauses, filter_params = _checkup_filters(lokasi=lokasi, status=status)
+    params.update(filter_params)
+    from_sql = f"""
+        FROM {latest_sql} l
+        JOIN checkups c ON c.checkup_id = l.checkup_id
+        JOIN karyawan k ON c.uid = k.uid
+    """
+    return from_sql, clauses, params
+
+@cached_read("checkups", "karyawan")
+def get_latest_checkup_page(columns=None, page_size=50, after=None, date_from=None, date_to=None,
+                            year=None, month=None, lokasi=None, status=None) -> pd.DataFrame:
+    """
+    One page of the latest checkup per employee (one row per UID), using
+    keyset pagination on (tanggal, checkup_id) descending. Reads
+    latest_checkups, so the cost is O(employees) instead of sorting all history
+    (see _latest_checkups_from for date windows).
+
+    after: (tanggal, checkup_id) of the last row of the previous page, or None
+    for the first page. The result always includes tanggal and checkup_id so
+    the caller can build the next cursor.
+    """
+    columns = list(columns or LOAD_CHECKUP_COLUMNS)
+    columns += [col for col in ("tanggal", "checkup_id") if col not in columns]
+    from_sql, clauses, params = _latest_checkups_from(date_from, date_to, year, month, lokasi, status)
+    if after is not None:
+        clauses.append("(l.tanggal, l.checkup_id) < (:after_tanggal, :after_id)")
+        params["after_tanggal"], params["after_id"] = after[0], int(after[1])
+    where_sql = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    params["page_size"] = int(page_size)
+    query = f"""
+        SELECT
+            {_select_sql(columns)}
+        {from_sql}
+        {where_sql}
+        ORDER BY l.tanggal DESC, l.checkup_id DESC
+        LIMIT :page_size
+    """
+    return pd.read_sql(text(query), get_engine(), params=params)
+
+@cached_read("checkups", "karyawan")
+def estimate_latest_checkup_count(date_from=None, date_to=None, year=None, month=None,
+                                  lokasi=None, status=None) -> int:
+    """Planner row estimate for get_latest_checkup_page()'s selection (no scan, EXPLAIN only)."""
+    from_sql, clauses, params = _latest_checkups_from(date_from, date_to, year, month, lokasi, status)
+    where_sql = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    with get_engine().connect() as conn:
+        plan = conn.execute(
+            text(f"EXPLAIN (FORMAT JSON) SELECT 1 {from_sql} {where_sql}"), params
+        ).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+# --- Aggregations (charts and KPIs) ---
+# Group key -> SQL expression for aggregate_checkups()
+CHECKUP_GROUPS = {
+    "lokasi": "k.lokasi",
+    "jabatan": "k.jabatan",
+    "status": STATUS_SQL,
+    "month": "date_trunc('month', c.tanggal)::date",
+    "year": "EXTRACT(YEAR FROM c.tanggal)::int",
+}
+
+# Metric name -> SQL aggregate for aggregate_checkups()
+CHECKUP_METRICS = {
+    "count": "COUNT(*)",
+    "employees": "COUNT(DISTINCT c.uid)",
+    "well": f"COUNT(*) FILTER (WHERE {STATUS_SQL} = 'Well')",
+    "unwell": f"COUNT(*) FILTER (WHERE {STATUS_SQL} = 'Unwell')",
+    "avg_bmi": "ROUND(AVG(c.bmi)::numeric, 2)",
+    "avg_lingkar_perut": "ROUND(AVG(c.lingkar_perut)::numeric, 2)",
+    "avg_gestational_diabetes": "ROUND(AVG(c.gestational_diabetes)::numeric, 2)",
+    "avg_cholesterol": "ROUND(AVG(c.cholesterol)::numeric, 2)",
+    "avg_asam_urat": "ROUND(AVG(c.asam_urat)::numeric, 2)",
+    "max_bmi": "MAX(c.bmi)",
+}
+
+@cached_read("checkups", "karyawan")
+def aggregate_checkups(group_by=None, metrics=("count",), latest_only=False,
+                       date_from=None, date_to=None, year=None, month=None,
+                       lokasi=None, uid=None, status=None) -> pd.DataFrame:
+    """
+    GROUP BY in Postgres for charts and KPIs; the result has one row per group.
+
+    group_by: keys of CHECKUP_GROUPS (e.g. ["lokasi", "status", "month"]);
+              no group_by returns a single totals row.
+    metrics:  keys of CHECKUP_METRICS (e.g. ["count", "avg_bmi"]).
+    latest_only: aggregate only each employee's latest checkup
+                 (same selection as get_latest_checkup_page()).
+    """
+    group_by, metrics = list(group_by or []), list(metrics)
+    unknown = [g for g in group_by if g not in CHECKUP_GROUPS] + \
+              [m for m in metrics if m not in CHECKUP_METRICS]
+    if unknown:
+        raise ValueError(f"Unknown group/metric: {unknown}")
+
+    if latest_only:
+        if uid is not None:
+            raise ValueError("uid filter is not supported with latest_only")
+        from_sql, clauses, params = _latest_checkups_from(date_from, date_to, year, month, lokasi, status)
+    else:
+        from_sql = """
+        FROM checkups c
+        JOIN karyawan k ON c.uid = k.uid
+        """
+        clauses, params = _checkup_filters(date_from, date_to, year, month, lokasi, uid, status)
+
+    select_sql = ",\n            ".join(
+        [f"{CHECKUP_GROUPS[g]} AS {g}" for g in group_by] +
+        [f"{CHECKUP_METRICS[m]} AS {m}" for m in metrics]
+    )
+    where_sql = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    group_sql = ""
+    if group_by:
+        positions = ", ".join(str(i + 1) for i in range(len(group_by)))
+        group_sql = f"GROUP BY {positions} ORDER BY {positions}"
+
+    query = f"""
+        SELECT
+            {select_sql}
+        {from_sql}
+        {where_sql}
+        {group_sql}
+    """
+    return pd.read_sql(text(query), get_engine(), params=params)
+
+# --- Full history frame, refreshed incrementally ---
+_history_lock = threading.Lock()
+_history = {
+    "frame": None,              # indexed by checkup_id
+    "karyawan_version": None,
+    "checkups_version": None,
+    "high_water_mark": None,    # server clock when the frame was last read
+    "loaded_at": 0.0,           # time.monotonic() of the last full load
+    "refreshed_at": 0.0,        # time.monotonic() of the last full/delta read
+}
+
+def _fetch_checkup_history(conn, since=None) -> pd.DataFrame:
+    clauses, params = [], {}
+    if since is not None:
+        clauses.append("c.updated_at > :since")
+        params["since"] = since
+    where_sql = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    query = f"""
+        SELECT
+            {_select_sql(["checkup_id"] + LOAD_CHECKUP_COLUMNS)}
+        FROM checkups c
+        JOIN karyawan k ON c.uid = k.uid
+        {where_sql}
+    """
+    return pd.read_sql(text(query), conn, params=params).set_index("checkup_id")
+
+def _sort_history(frame):
+    return frame.sort_values("tanggal", ascending=False, kind="stable")
+
+def prune_checkup_tombstones(retention_hours=CHECKUP_TOMBSTONE_RETENTION_HOURS) -> int:
+    """Drop tombstones older than the retention window."""
+    with get_engine().begin() as conn:
+        result = conn.execute(
+            text("DELETE FROM checkup_tombstones "
+                 "WHERE deleted_at < clock_timestamp() - make_interval(hours => :h)"),
+            {"h": int(retention_hours)}
+        )
+    return result.rowcount
+
+def load_checkups():
+    """
+    Full checkup history (all rows, export columns), newest first.
+
+    The frame is kept in memory for all sessions. After a checkups write only
+    rows whose updated_at is past the high-water mark are fetched and merged,
+    and deleted rows are dropped using the checkup_tombstones log. A karyawan
+    change (names, lokasi) or a snapshot older than the tombstone retention
+    triggers a full reload.
+    """
+    with _history_lock:
+        karyawan_version = table_version("karyawan")
+        checkups_version = table_version("checkups")
+        now = time.monotonic()
+        frame = _history["frame"]
+        full_reload = (
+            frame is None
+            or _history["karyawan_version"] != karyawan_version
+            or now - _history["loaded_at"] > CHECKUP_TOMBSTONE_RETENTION_HOURS * 3600 / 2
+        )
+        stale = (
+            _history["checkups_version"] != checkups_version
+            or now - _history["refreshed_at"] > QUERY_CACHE_TTL_SECONDS
+        )
+
+        if full_reload:
+            prune_checkup_tombstones()
+            with get_engine().connect() as conn:
+                high_water_mark = conn.execute(text("SELECT clock_timestamp()")).scalar()
+                frame = _sort_history(_fetch_checkup_history(conn))
+            _history["loaded_at"] = now
+        elif stale:
+            since = _history["high_water_mark"] - timedelta(seconds=CHECKUP_DELTA_OVERLAP_SECONDS)
+            with get_engine().connect() as conn:
+                high_water_mark = conn.execute(text("SELECT clock_timestamp()")).scalar()
+                changed = _fetch_checkup_history(conn, since=since)
+                deleted = conn.execute(
+                    text("SELECT checkup_id FROM checkup_tombstones WHERE deleted_at > :since"),
+                    {"since": since}
+                ).scalars().all()
+            if len(changed) or deleted:
+                frame = frame.drop(index=changed.index.union(pd.Index(deleted)), errors="ignore")
+                frame = _sort_history(pd.concat([frame, changed]))
+        else:
+            return frame[LOAD_CHECKUP_COLUMNS].reset_index(drop=True)
+
+        _history.update(
+            frame=frame,
+            karyawan_version=karyawan_version,
+            checkups_version=checkups_version,
+            high_water_mark=high_water_mark,
+            refreshed_at=now,
+        )
+        return frame[LOAD_CHECKUP_COLUMNS].reset_index(drop=True)
+
+def get_checkups_for_uid(uid, columns=None) -> pd.DataFrame:
+    """
+    One employee's checkup history, newest first.
+    Served by the idx_checkups_uid_tanggal index, so the cost does not grow
+    with the size of the whole checkups table.
+    """
+    return query_checkups(columns=columns, uid=uid)
+
+@cached_read("checkups")
+def get_checkup_years() -> list:
+    """Distinct checkup years, ascending (for the year filter)."""
+    with get_engine().connect() as conn:
+        rows = conn.execute(text(
+            "SELECT DISTINCT EXTRACT(YEAR FROM tanggal)::int AS tahun "
+            "FROM checkups ORDER BY tahun"
+        )).fetchall()
+    return [row[0] for row in rows]
+
+@cached_read("checkups", "karyawan")
+def get_checkup_employees() -> pd.DataFrame:
+    """uid and nama of every employee with at least one checkup, by nama."""
+    query = """
+        SELECT k.uid, k.username AS nama
+        FROM karyawan k
+        WHERE EXISTS (SELECT 1 FROM checkups c WHERE c.uid = k.uid)
+        ORDER BY k.username, k.uid
     """
     return pd.read_sql(query, get_engine())
 
-def save_checkups(df):
+@cached_read("karyawan")
+def get_lokasi_options() -> list:
+    """Distinct karyawan locations (for the lokasi filter)."""
+    with get_engine().connect() as conn:
+        rows = conn.execute(text(
+            "SELECT DISTINCT lokasi FROM karyawan WHERE lokasi IS NOT NULL ORDER BY lokasi"
+        )).fetchall()
+    return [row[0] for row in rows]
+
+@cached_read("health_rules")
+def get_health_rules() -> pd.DataFrame:
+    """Rules evaluated by utils.health (one row per metric/age band)."""
+    with get_engine().connect() as conn:
+        return load_health_rules(conn)
+
+@invalidates("health_rules")
+def save_health_rules(rules: pd.DataFrame) -> int:
+    """
+    Replace every health rule with the rows of rules (RULE_COLUMNS), in one
+    transaction. New writes use them right away; stored statuses follow
+    after `python -m db.backfill_status`. Returns the number of rules saved.
+    """
+    missing_cols = [c for c in RULE_COLUMNS if c not in rules.columns]
+    if missing_cols:
+        raise ValueError(f"Missing required columns: {missing_cols}")
+    records = rules[RULE_COLUMNS].astype(object).where(rules[RULE_COLUMNS].notnull(), None)
+
+    with get_engine().begin() as conn:
+        conn.execute(text("DELETE FROM health_rules"))
+        if len(records):
+            conn.execute(
+                text(f"INSERT INTO health_rules ({', '.join(RULE_COLUMNS)}) "
+                     f"VALUES ({', '.join(':' + c for c in RULE_COLUMNS)})"),
+                records.to_dict("records")
+            )
+    return len(records)
+
+@cached_read("checkups")
+def count_checkup_employees() -> int:
+    """Number of karyawan with at least one checkup."""
+    with get_engine().connect() as conn:
+        result = conn.execute(text("SELECT COUNT(*) FROM latest_checkups")).scalar()
+    return result or 0
+
+# --- Bulk insert helpers ---
+def _copy_rows(dbapi_conn, table, columns, rows):
+    """Write rows to `table` with one COPY FROM STDIN (CSV, empty = NULL)."""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    with dbapi_conn.cursor() as cur:
+        cur.copy_expert(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+        )
+
+def copy_insert(table, conn, keys, data_iter):
+    """
+    Insert method for DataFrame.to_sql(method=...).
+
+    Streams each chunk through psycopg2 COPY FROM STDIN on PostgreSQL and
+    falls back to a plain executemany on other backends.
+    """
+    if conn.dialect.name != "postgresql":
+        conn.execute(table.table.insert(), [dict(zip(keys, row)) for row in data_iter])
+        return
+    name = f"{table.schema}.{table.name}" if table.schema else table.name
+    _copy_rows(conn.connection, name, keys, data_iter)
+
+def _copy_dataframe(conn, df, table, chunksize=DB_COPY_CHUNKSIZE):
+    """Stream a DataFrame into `table` with COPY FROM STDIN, chunk by chunk."""
+    columns = list(df.columns)
+    for start in range(0, len(df), chunksize):
+        chunk = df.iloc[start:start + chunksize].astype(object)
+        rows = chunk.where(pd.notnull(chunk), None).itertuples(index=False, name=None)
+        _copy_rows(conn.connection, table, columns, rows)
+
+@invalidates("checkups")
+def save_checkups(df, chunksize=DB_COPY_CHUNKSIZE):
     missing_cols = [col for col in CHECKUP_COLUMNS if col not in df.columns]
     if missing_cols:
         raise ValueError(f"Missing required columns: {missing_cols}")
-    df = df[CHECKUP_COLUMNS]
+    df = df[CHECKUP_COLUMNS].copy()
+    df["status"] = compute_status(df, get_health_rules())
     try:
-        df.to_sql("checkups", get_engine(), if_exists="append", index=False)
+        df.to_sql("checkups", get_engine(), if_exists="append", index=False,
+                  method=copy_insert, chunksize=chunksize)
     except SQLAlchemyError as e:
         raise e
 
+# Columns staged by save_uploaded_checkups() (karyawan identity + checkup values)
+UPLOAD_STAGE_COLUMNS = [
+    "nama", "jabatan", "lokasi", "tanggal", "tanggal_lahir", "umur",
+    "tinggi", "berat", "lingkar_perut", "bmi",
+    "gestational_diabetes", "cholesterol", "asam_urat", "status"
+]
+
+@invalidates("checkups", "karyawan")
 def save_uploaded_checkups(df):
+    """
+    Bulk-save an uploaded checkup file, creating missing karyawan on the fly.
+
+    All-or-nothing: the upload is staged into a temp table with COPY, karyawan
+    are resolved/created with one INSERT ... ON CONFLICT on
+    (username, jabatan, lokasi), and all checkups are inserted in one
+    statement, inside a single transaction. Returns the number of checkups saved.
+    """
+    with get_engine().begin() as conn:
+        return insert_uploaded_checkups(conn, df, str(uuid.uuid4()))
+
+def insert_uploaded_checkups(conn, df, batch_id) -> int:
+    """
+    save_uploaded_checkups() inside the caller's transaction (db.ingest commits
+    one chunk per transaction). Does not invalidate the query cache.
+    """
     required_cols = ["nama", "jabatan", "lokasi", "tanggal",
                      "tanggal_lahir", "tinggi", "berat", "lingkar_perut",
                      "bmi", "gestational_diabetes", "cholesterol", "asam_urat"]
@@ -122,31 +585,135 @@ def save_uploaded_checkups(df):
 
     df["tanggal"] = pd.to_datetime(df["tanggal"], errors="coerce").dt.date
     df["tanggal_lahir"] = pd.to_datetime(df["tanggal_lahir"], errors="coerce").dt.date
-    df["umur"] = df["tanggal_lahir"].apply(lambda d: calculate_age(d) if pd.notnull(d) else 0)
+    df["umur"] = calculate_age_series(df["tanggal_lahir"], as_of=df["tanggal"])
 
     numeric_cols = ["tinggi", "berat", "lingkar_perut", "bmi",
                     "gestational_diabetes", "cholesterol", "asam_urat"]
     for col in numeric_cols:
-        df[col] = pd.to_numeric(df.get(col, 0), errors="coerce").fillna(0).round(2)
-
-    batch_id = str(uuid.uuid4())
-    uids = []
-    for _, row in df.iterrows():
-        uid = add_employee_if_missing(
-            row["nama"], row["jabatan"], row["lokasi"], row["tanggal_lahir"],
-            upload_batch_id=batch_id
-        )
-        uids.append(uid)
-    df["uid"] = uids
+        df[col] = pd.to_numeric(df[col], errors="coerce").round(2)
+
+    df["status"] = compute_status(df, get_health_rules())
+    stage_df = df[UPLOAD_STAGE_COLUMNS].copy()
+    stage_df["umur"] = stage_df["umur"].astype(int)
+
+    # ⚡ Stage via COPY, resolve/create karyawan, insert checkups
+    conn.execute(text("""
+        CREATE TEMP TABLE upload_checkups_stage (
+            nama TEXT,
+            jabatan TEXT,
+            lokasi TEXT,
+            tanggal DATE,
+            tanggal_lahir DATE,
+            umur INTEGER,
+            tinggi NUMERIC(5,2),
+            berat NUMERIC(5,2),
+            lingkar_perut NUMERIC(5,2),
+            bmi NUMERIC(5,2),
+            gestational_diabetes NUMERIC(5,2),
+            cholesterol NUMERIC(5,2),
+            asam_urat NUMERIC(5,2),
+            status VARCHAR(50)
+        ) ON COMMIT DROP
+    """))
+    _copy_dataframe(conn, stage_df, "upload_checkups_stage")
+
+    conn.execute(
+        text("""
+            INSERT INTO karyawan (uid, username, jabatan, lokasi, tanggal_lahir,
+                                  uploaded_at, upload_batch_id)
+            SELECT gen_random_uuid(), nama, jabatan, lokasi, MAX(tanggal_lahir), NOW(), :batch
+            FROM upload_checkups_stage
+            GROUP BY nama, jabatan, lokasi
+            ON CONFLICT (username, jabatan, lokasi) DO NOTHING
+        """),
+        {"batch": batch_id}
+    )
+
+    result = conn.execute(text("""
+        INSERT INTO checkups (uid, tanggal, tanggal_lahir, umur, tinggi, berat,
+                              lingkar_perut, bmi, gestational_diabetes,
+                              cholesterol, asam_urat, status)
+        SELECT k.uid, s.tanggal, s.tanggal_lahir, s.umur, s.tinggi, s.berat,
+               s.lingkar_perut, s.bmi, s.gestational_diabetes,
+               s.cholesterol, s.asam_urat, s.status
+        FROM upload_checkups_stage s
+        JOIN karyawan k
+          ON k.username = s.nama
+         AND k.jabatan IS NOT DISTINCT FROM s.jabatan
+         AND k.lokasi IS NOT DISTINCT FROM s.lokasi
+    """))
+    return result.rowcount
 
-    df_to_save = df[CHECKUP_COLUMNS].copy()
-    save_checkups(df_to_save)
+# Editable checkup values written back by update_checkups()
+EDITABLE_CHECKUP_COLUMNS = [
+    "tanggal", "tanggal_lahir", "umur", "tinggi", "berat", "lingkar_perut",
+    "bmi", "gestational_diabetes", "cholesterol", "asam_urat"
+]
+
+@invalidates("checkups")
+def update_checkups(df: pd.DataFrame) -> int:
+    """
+    Write edited checkups back in place, matched by checkup_id, recomputing
+    status. One COPY into a staging table and one UPDATE, in one transaction.
+    Returns the number of rows updated.
+    """
+    missing_cols = [c for c in ["checkup_id"] + EDITABLE_CHECKUP_COLUMNS if c not in df.columns]
+    if missing_cols:
+        raise ValueError(f"Missing required columns: {missing_cols}")
+    df = df[df["checkup_id"].notnull()]
+    if df.empty:
+        return 0
+
+    stage_df = df[["checkup_id"] + EDITABLE_CHECKUP_COLUMNS].copy()
+    stage_df["checkup_id"] = stage_df["checkup_id"].astype(int)
+    for col in ["tanggal", "tanggal_lahir"]:
+        stage_df[col] = pd.to_datetime(stage_df[col], errors="coerce").dt.date
+    stage_df["status"] = compute_status(stage_df, get_health_rules())
+
+    with get_engine().begin() as conn:
+        conn.execute(text("""
+            CREATE TEMP TABLE edit_checkups_stage (
+                checkup_id INTEGER,
+                tanggal DATE,
+                tanggal_lahir DATE,
+                umur NUMERIC,
+                tinggi NUMERIC(5,2),
+                berat NUMERIC(5,2),
+                lingkar_perut NUMERIC(5,2),
+                bmi NUMERIC(5,2),
+                gestational_diabetes NUMERIC(5,2),
+                cholesterol NUMERIC(5,2),
+                asam_urat NUMERIC(5,2),
+                status VARCHAR(50)
+            ) ON COMMIT DROP
+        """))
+        _copy_dataframe(conn, stage_df, "edit_checkups_stage")
+        result = conn.execute(text("""
+            UPDATE checkups c
+            SET tanggal = COALESCE(s.tanggal, c.tanggal),
+                tanggal_lahir = s.tanggal_lahir,
+                umur = ROUND(s.umur)::integer,
+                tinggi = s.tinggi,
+                berat = s.berat,
+                lingkar_perut = s.lingkar_perut,
+                bmi = s.bmi,
+                gestational_diabetes = s.gestational_diabetes,
+                cholesterol = s.cholesterol,
+                asam_urat = s.asam_urat,
+                status = s.status
+            FROM edit_checkups_stage s
+            WHERE c.checkup_id = s.checkup_id
+        """))
+    return result.rowcount
 
 # --- Users ---
+@cached_read("users")
 def get_users():
     query = "SELECT username, role FROM users"
     return pd.read_sql(query, get_engine())
 
+# Not cached: authenticate() must always see the current password hash,
+# including resets made by other processes (cache bumps are per process)
 def get_user_by_username(username):
     with get_engine().connect() as conn:
         result = conn.execute(
@@ -155,8 +722,10 @@ def get_user_by_username(username):
         ).fetchone()
     return dict(result._mapping) if result else None
 
+@invalidates("users")
 def add_user(username, password, role):
-    hashed_pw = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode("utf-8")
+    from auth.passwords import hash_password
+    hashed_pw = hash_password(password)
     with get_engine().begin() as conn:
         conn.execute(
             text("INSERT INTO users (username, password, role) VALUES (:u, :p, :r)"),
@@ -164,18 +733,61 @@ def add_user(username, password, role):
         )
 
 # --- Master User Functions ---
+@invalidates("users")
 def delete_user(username: str):
     with get_engine().begin() as conn:
         conn.execute(text("DELETE FROM users WHERE username = :username"), {"username": username})
 
+@invalidates("users")
 def reset_user_password(username: str, new_password: str):
-    hashed_pw = bcrypt.hashpw(new_password.encode(), bcrypt.gensalt()).decode("utf-8")
+    from auth.passwords import hash_password
+    hashed_pw = hash_password(new_password)
     with get_engine().begin() as conn:
         conn.execute(
             text("UPDATE users SET password = :pw WHERE username = :username"),
             {"pw": hashed_pw, "username": username}
         )
 
+@invalidates("users")
+def replace_password_hash(username: str, old_hash: str, new_hash: str) -> bool:
+    """
+    Swap a stored hash for a rehash of the same password (new bcrypt cost).
+    Only applies if the hash is unchanged, so a concurrent reset wins.
+    """
+    with get_engine().begin() as conn:
+        result = conn.execute(
+            text("UPDATE users SET password = :new WHERE username = :username AND password = :old"),
+            {"new": new_hash, "username": username, "old": old_hash}
+        )
+    return result.rowcount == 1
+
+@invalidates("users")
+def reset_user_passwords(passwords: dict) -> int:
+    """
+    Set many passwords at once ({username: new_password}).
+    Hashes in parallel (auth.passwords.hash_passwords) and writes every hash
+    with one UPDATE in one transaction. Returns the number of users updated.
+    """
+    from auth.passwords import hash_passwords
+
+    if not passwords:
+        return 0
+    usernames = list(passwords)
+    hashes = hash_passwords(passwords[u] for u in usernames)
+    with get_engine().begin() as conn:
+        result = conn.execute(
+            text("""
+                UPDATE users u
+                SET password = v.password
+                FROM unnest(CAST(:usernames AS text[]), CAST(:hashes AS text[]))
+                     AS v(username, password)
+                WHERE u.username = v.username
+            """),
+            {"usernames": usernames, "hashes": hashes}
+        )
+    return result.rowcount
+
+@cached_read("users")
 def count_users_by_role(role: str) -> int:
     with get_engine().connect() as conn:
         result = conn.execute(
@@ -185,51 +797,136 @@ def count_users_by_role(role: str) -> int:
     return result or 0
 
 # --- Master Karyawan Upload ---
-def save_uploaded_karyawan(df: pd.DataFrame) -> None:
-    if df.empty:
-        return
-    batch_id = str(uuid.uuid4())
+@invalidates("karyawan")
+def save_uploaded_karyawan(df: pd.DataFrame) -> dict:
+    """
+    Merge a master karyawan roster in bulk, keyed by uid.
+
+    The file is COPYed into a staging table and merged with one
+    INSERT ... ON CONFLICT (uid) DO UPDATE. Rows whose uid is unknown to the
+    database (e.g. generated by prepare_karyawan_master_df) but whose nama
+    matches an existing karyawan keep that karyawan's uid, so monthly rosters
+    without a uid column do not duplicate people.
+
+    Returns counts: {"inserted": n, "updated": n, "unchanged": n}.
+    """
     with get_engine().begin() as conn:
-        for _, row in df.iterrows():
-            username = row.get("nama")
-            jabatan = row.get("jabatan")
-            lokasi  = row.get("lokasi")
-            tanggal_lahir = pd.to_datetime(row.get("tanggal_lahir"), errors="coerce")
-            tanggal_lahir = tanggal_lahir.date() if pd.notnull(tanggal_lahir) else None
-            result = conn.execute(
-                text("SELECT uid FROM karyawan WHERE username = :username"),
-                {"username": username}
-            ).fetchone()
-            if result:
-                conn.execute(
-                    text("""
-                        UPDATE karyawan
-                        SET jabatan = :jabatan,
-                            lokasi = :lokasi,
-                            tanggal_lahir = :dob
-                        WHERE uid = :uid
-                    """),
-                    {"jabatan": jabatan, "lokasi": lokasi, "dob": tanggal_lahir, "uid": result._mapping["uid"]},
-                )
-            else:
-                new_uid = str(uuid.uuid4())
-                conn.execute(
-                    text("""
-                        INSERT INTO karyawan (uid, username, jabatan, lokasi,
-                                              tanggal_lahir, uploaded_at, upload_batch_id)
-                        VALUES (:uid, :username, :jabatan, :lokasi, :dob, NOW(), :batch)
-                    """),
-                    {"uid": new_uid, "username": username, "jabatan": jabatan,
-                     "lokasi": lokasi, "dob": tanggal_lahir, "batch": batch_id},
-                )
+        return merge_uploaded_karyawan(conn, df, str(uuid.uuid4()))
+
+def merge_uploaded_karyawan(conn, df: pd.DataFrame, batch_id) -> dict:
+    """
+    save_uploaded_karyawan() inside the caller's transaction (db.ingest commits
+    one chunk per transaction). Does not invalidate the query cache.
+    """
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+    if df.empty:
+        return counts
+
+    tanggal_lahir = (
+        pd.to_datetime(df["tanggal_lahir"], errors="coerce").dt.date
+        if "tanggal_lahir" in df.columns else None
+    )
+    stage_df = pd.DataFrame({
+        "row_no": range(len(df)),
+        "uid": df["uid"].astype(str).values,
+        "username": df["nama"].values,
+        "jabatan": df["jabatan"].values,
+        "lokasi": df["lokasi"].values,
+        "tanggal_lahir": tanggal_lahir.values if tanggal_lahir is not None else None,
+    })
+
+    conn.execute(text("""
+        CREATE TEMP TABLE upload_karyawan_stage (
+            row_no INTEGER,
+            uid UUID,
+            username TEXT,
+            jabatan TEXT,
+            lokasi TEXT,
+            tanggal_lahir DATE
+        ) ON COMMIT DROP
+    """))
+    _copy_dataframe(conn, stage_df, "upload_karyawan_stage")
+
+    # Rows without a known uid fall back to matching by nama, preferring the
+    # karyawan with the same jabatan/lokasi
+    conn.execute(text("""
+        UPDATE upload_karyawan_stage s
+        SET uid = m.uid
+        FROM (
+            SELECT DISTINCT ON (s2.row_no) s2.row_no, k.uid
+            FROM upload_karyawan_stage s2
+            JOIN karyawan k ON k.username = s2.username
+            WHERE NOT EXISTS (SELECT 1 FROM karyawan known WHERE known.uid = s2.uid)
+            ORDER BY s2.row_no,
+                     (k.jabatan IS NOT DISTINCT FROM s2.jabatan
+                      AND k.lokasi IS NOT DISTINCT FROM s2.lokasi) DESC,
+                     k.uploaded_at, k.uid
+        ) m
+        WHERE s.row_no = m.row_no
+    """))
+
+    # Still-unknown rows repeating an identity (nama, jabatan, lokasi) of the
+    # file share one uid, else each would insert its own row and collide on
+    # uq_karyawan_identity
+    conn.execute(text("""
+        UPDATE upload_karyawan_stage s
+        SET uid = f.uid
+        FROM (
+            SELECT DISTINCT ON (username, jabatan, lokasi) username, jabatan, lokasi, uid
+            FROM upload_karyawan_stage s2
+            ORDER BY username, jabatan, lokasi,
+                     EXISTS (SELECT 1 FROM karyawan known WHERE known.uid = s2.uid) DESC,
+                     row_no
+        ) f
+        WHERE s.username IS NOT DISTINCT FROM f.username
+          AND s.jabatan IS NOT DISTINCT FROM f.jabatan
+          AND s.lokasi IS NOT DISTINCT FROM f.lokasi
+          AND s.uid <> f.uid
+          AND NOT EXISTS (SELECT 1 FROM karyawan known WHERE known.uid = s.uid)
+    """))
+
+    total = conn.execute(
+        text("SELECT COUNT(DISTINCT uid) FROM upload_karyawan_stage")
+    ).scalar()
+
+    # Last row wins when the file lists the same uid twice
+    merged = conn.execute(
+        text("""
+            INSERT INTO karyawan (uid, username, jabatan, lokasi, tanggal_lahir,
+                                  uploaded_at, upload_batch_id)
+            SELECT DISTINCT ON (uid)
+                   uid, username, jabatan, lokasi, tanggal_lahir, NOW(), :batch
+            FROM upload_karyawan_stage
+            ORDER BY uid, row_no DESC
+            ON CONFLICT (uid) DO UPDATE
+            SET username = EXCLUDED.username,
+                jabatan = EXCLUDED.jabatan,
+                lokasi = EXCLUDED.lokasi,
+                tanggal_lahir = COALESCE(EXCLUDED.tanggal_lahir, karyawan.tanggal_lahir)
+            WHERE (karyawan.username, karyawan.jabatan, karyawan.lokasi,
+                   karyawan.tanggal_lahir)
+                  IS DISTINCT FROM
+                  (EXCLUDED.username, EXCLUDED.jabatan, EXCLUDED.lokasi,
+                   COALESCE(EXCLUDED.tanggal_lahir, karyawan.tanggal_lahir))
+            RETURNING (xmax = 0) AS inserted
+        """),
+        {"batch": batch_id}
+    ).fetchall()
+
+    counts["inserted"] = sum(1 for row in merged if row.inserted)
+    counts["updated"] = len(merged) - counts["inserted"]
+    counts["unchanged"] = (total or 0) - len(merged)
+    return counts
 
 # --- Karyawan Count ---
+@cached_read("karyawan")
 def get_total_karyawan() -> int:
     with get_engine().connect() as conn:
         result = conn.execute(text("SELECT COUNT(*) FROM karyawan")).scalar()
     return result or 0
 
 # --- Upload History Helpers ---
+@cached_read("karyawan")
 def get_upload_history() -> pd.DataFrame:
     query = """
         SELECT
@@ -243,15 +940,25 @@ def get_upload_history() -> pd.DataFrame:
     """
     return pd.read_sql(query, get_engine())
 
+@invalidates("karyawan", "checkups")
 def delete_batch(batch_id: str) -> None:
-    """Delete all karyawan records in a specific upload batch."""
+    """
+    Delete all karyawan records in a specific upload batch, together with
+    the batch's uploads ledger row (upload_id = batch id), so the same file
+    can be imported again afterwards.
+    """
     with get_engine().begin() as conn:
         conn.execute(
             text("DELETE FROM karyawan WHERE upload_batch_id = :bid"),
             {"bid": batch_id}
         )
+        conn.execute(
+            text("DELETE FROM uploads WHERE upload_id = :bid"),
+            {"bid": str(batch_id)}
+        )
 
 # --- Master Delete Helpers ---
+@invalidates("karyawan", "checkups")
 def delete_employee_by_uid(uid: str):
     """Delete a single karyawan by UID."""
     with get_engine().begin() as conn:
@@ -260,15 +967,18 @@ def delete_employee_by_uid(uid: str):
             {"uid": uid}
         )
 
+@invalidates("karyawan", "checkups")
 def delete_all_employees():
     """Delete all karyawan (use with caution)."""
     with get_engine().begin() as conn:
         conn.execute(text("DELETE FROM karyawan"))
 
+@invalidates("checkups")
 def delete_checkup_by_id(checkup_id: int):
     with get_engine().begin() as conn:
-        conn.execute(text("DELETE FROM checkups WHERE id = :id"), {"id": checkup_id})
+        conn.execute(text("DELETE FROM checkups WHERE checkup_id = :id"), {"id": checkup_id})
 
+@invalidates("checkups")
 def delete_all_checkups():
     with get_engine().begin() as conn:
         conn.execute(text("DELETE FROM checkups"))
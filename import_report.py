@@ -0,0 +1,114 @@
+# import_report.py
+"""
+Import-time report for the app's entry points (based on `python -X importtime`).
+
+Every entry is imported in a fresh interpreter. The report shows the total
+import time, the slowest top-level modules and which heavy libraries were
+pulled in, so start-up regressions (e.g. altair creeping into the QR landing
+path) are easy to spot.
+
+Usage:
+    python import_report.py                       # all entries
+    python import_report.py qr_landing --top 15   # one entry, more detail
+    python import_report.py --budget-ms 1500      # exit 1 if any entry is slower
+"""
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+# Modules each role loads, mirroring the lazy imports in app.main()
+ENTRIES = {
+    "qr_landing": ["app_router", "ui.karyawan_interface"],
+    "login": ["auth.login_ui"],
+    "manager": ["ui.manager_interface"],
+    "nurse": ["ui.nurse_interface"],
+    "master": ["ui.master_interface"],
+}
+
+# Libraries that should only load for the roles that need them
+HEAVY_LIBRARIES = ["altair", "qrcode", "PIL", "openpyxl", "xlsxwriter", "bcrypt"]
+
+BASE_DIR = Path(__file__).resolve().parent
+
+
+def measure(modules):
+    """
+    Import modules in a fresh interpreter.
+    Returns (top_level, loaded): [(module, cumulative_us)] for the modules
+    imported directly at depth 0, and the set of every module loaded.
+    Raises RuntimeError with the interpreter's error if the import fails.
+    """
+    code = f"import {', '.join(modules)}" if modules else "pass"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BASE_DIR, capture_output=True, text=True
+    )
+    top_level, loaded = [], set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        try:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            cumulative = int(cumulative)
+        except ValueError:
+            continue
+        module = name.strip()
+        loaded.add(module)
+        if not name.startswith("  ", 1):   # one space after "|" = depth 0
+            top_level.append((module, cumulative))
+    if proc.returncode != 0:
+        errors = [l for l in proc.stderr.splitlines() if not l.startswith("import time:")]
+        raise RuntimeError("\n".join(errors[-5:]))
+    return top_level, loaded
+
+
+def report(name, modules, top=8):
+    """Print the report for one entry; returns its total import time in ms (None on failure)."""
+    print(f"\n== {name}: import {', '.join(modules)}")
+    try:
+        top_level, loaded = measure(modules)
+    except RuntimeError as e:
+        print(f"   ❌ import failed:\n{e}")
+        return None
+
+    # Leave out what the interpreter imports at start-up anyway (site, encodings, ...)
+    _, startup = measure([])
+    top_level = [(module, us) for module, us in top_level if module not in startup]
+    loaded -= startup
+
+    total_ms = sum(us for _, us in top_level) / 1000
+    print(f"   total {total_ms:8.1f} ms, {len(loaded)} modules")
+    for module, us in sorted(top_level, key=lambda item: -item[1])[:top]:
+        print(f"   {us / 1000:8.1f} ms  {module}")
+
+    roots = {module.split(".")[0] for module in loaded}
+    heavy = [lib for lib in HEAVY_LIBRARIES if lib in roots]
+    print(f"   heavy libraries: {', '.join(heavy) if heavy else '-'}")
+    return total_ms
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import-time report per app entry point")
+    parser.add_argument("entries", nargs="*", metavar="entry",
+                        help=f"entries to measure: {', '.join(ENTRIES)} (default: all)")
+    parser.add_argument("--top", type=int, default=8, help="slowest top-level modules to list")
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="exit with status 1 if any entry takes longer")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.entries if name not in ENTRIES]
+    if unknown:
+        parser.error(f"unknown entries: {', '.join(unknown)}")
+
+    over_budget = False
+    for name in args.entries or list(ENTRIES):
+        total_ms = report(name, ENTRIES[name], top=args.top)
+        if total_ms is None or (args.budget_ms is not None and total_ms > args.budget_ms):
+            over_budget = True
+    if over_budget:
+        print("\n❌ Some entries failed or are over budget.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,6 @@
 import pandas as pd
 from datetime import datetime, timedelta
 from db.queries import save_checkups, get_employees
-from sqlalchemy import create_engine
-from config.settings import POSTGRES_URL, DB_FILE
-from db.queries import get_engine
 
 # --- Dummy employees ---
 dummy_employees = [
@@ -0,0 +1,33 @@
+# tests/conftest.py
+"""
+Shared fixtures. Database tests run against MCU_TEST_DATABASE_URL (a
+throwaway PostgreSQL 15+ database, migrated here) and are skipped when it
+is not set, so they never touch the database configured in supa.env.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def test_engine(monkeypatch):
+    url = os.getenv("MCU_TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("MCU_TEST_DATABASE_URL is not set")
+    pytest.importorskip("streamlit")
+    from sqlalchemy import create_engine
+
+    import db.ingest
+    import db.queries
+    from db.migrations import upgrade
+
+    engine = create_engine(url)
+    upgrade(engine)
+    # Modules import get_engine by name; point every user at the test database
+    for module in (db.ingest, db.queries):
+        monkeypatch.setattr(module, "get_engine", lambda: engine)
+    yield engine
+    engine.dispose()
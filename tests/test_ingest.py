@@ -0,0 +1,39 @@
+# tests/test_ingest.py
+import io
+import uuid
+
+
+def _roster_csv(names):
+    rows = "\n".join(f"{name},Operator,Rig Test" for name in names)
+    return f"nama,jabatan,lokasi\n{rows}\n".encode("utf-8")
+
+
+def test_deleted_batch_can_be_imported_again(test_engine):
+    from sqlalchemy import text
+    from db.ingest import ingest_upload
+    from db.queries import delete_batch
+
+    names = [f"test-{uuid.uuid4()}" for _ in range(3)]
+    content = _roster_csv(names)
+
+    first = ingest_upload(io.BytesIO(content), "roster.csv")
+    assert not first["duplicate"]
+    assert first["status"] == "committed"
+
+    # Same content while committed: short-circuits without importing
+    assert ingest_upload(io.BytesIO(content), "roster.csv")["duplicate"]
+
+    delete_batch(str(first["upload_id"]))
+
+    second = ingest_upload(io.BytesIO(content), "roster.csv")
+    try:
+        assert not second["duplicate"]
+        assert second["result"]["inserted"] == len(names)
+        with test_engine.connect() as conn:
+            count = conn.execute(
+                text("SELECT COUNT(*) FROM karyawan WHERE username = ANY(:names)"),
+                {"names": names}
+            ).scalar()
+        assert count == len(names)
+    finally:
+        delete_batch(str(second["upload_id"]))
@@ -0,0 +1,68 @@
+# ui/history_table.py
+import streamlit as st
+from db.queries import get_latest_checkup_page, estimate_latest_checkup_count
+
+PAGE_SIZE_OPTIONS = [25, 50, 100, 200]
+
+def _highlight_unwell(row):
+    return ['color: red' if row.status == 'Unwell' else '' for _ in row]
+
+def paginated_history_table(key, columns, filters):
+    """
+    Render the latest-checkup-per-UID table one page at a time.
+
+    Pages are fetched with keyset pagination (db.queries.get_latest_checkup_page),
+    so only the visible rows are queried and sent to the browser.
+    The cursor stack lives in st.session_state[f"{key}_cursors"] and is reset
+    whenever the filters or page size change.
+    """
+    cursors_key = f"{key}_cursors"
+    next_key = f"{key}_next_cursor"
+    signature_key = f"{key}_signature"
+
+    page_size = st.selectbox(
+        "Baris per halaman", PAGE_SIZE_OPTIONS, index=1, key=f"{key}_page_size"
+    )
+
+    signature = (repr(sorted(filters.items())), page_size)
+    if st.session_state.get(signature_key) != signature:
+        st.session_state[signature_key] = signature
+        st.session_state[cursors_key] = [None]   # first page has no cursor
+
+    cursors = st.session_state[cursors_key]
+    page = get_latest_checkup_page(
+        columns=columns, page_size=page_size + 1, after=cursors[-1], **filters
+    )
+    has_next = len(page) > page_size
+    page = page.iloc[:page_size]
+    if not page.empty:
+        last = page.iloc[-1]
+        st.session_state[next_key] = (last["tanggal"], int(last["checkup_id"]))
+
+    estimate = estimate_latest_checkup_count(**filters)
+    page_no = len(cursors)
+    total_pages = max(page_no, -(-estimate // page_size))
+
+    df_to_display = page[columns].reset_index(drop=True)
+    st.dataframe(
+        df_to_display.style.format({
+            'tinggi': '{:.2f}',
+            'lingkar_perut': '{:.2f}',
+            'bmi': '{:.2f}'
+        }).apply(_highlight_unwell, axis=1),
+        use_container_width=True
+    )
+
+    def go_next():
+        st.session_state[cursors_key].append(st.session_state[next_key])
+
+    def go_prev():
+        if len(st.session_state[cursors_key]) > 1:
+            st.session_state[cursors_key].pop()
+
+    col_prev, col_info, col_next = st.columns([1, 3, 1])
+    col_prev.button("⬅️ Sebelumnya", key=f"{key}_prev", on_click=go_prev,
+                    disabled=page_no == 1, use_container_width=True)
+    col_info.caption(f"Halaman {page_no} dari ±{total_pages} (±{estimate} karyawan)")
+    col_next.button("Berikutnya ➡️", key=f"{key}_next", on_click=go_next,
+                    disabled=not has_next, use_container_width=True)
@@ -1,7 +1,8 @@
 # ui/karyawan_interface.py
 import streamlit as st
 import pandas as pd
-from db.queries import load_checkups
+from db.queries import get_checkups_for_uid, get_health_rules
+from utils.health import evaluate_health
 
 def karyawan_interface(uid=None):
     """
@@ -24,43 +25,39 @@ def karyawan_interface(uid=None):
         st.error("❌ UID tidak ditemukan di URL. Silakan scan QR code yang benar.")
         return
 
-    # --- 2️⃣ Load and filter data -------------------------------------------
-    df = load_checkups()
-    if df.empty:
-        st.warning("Belum ada data medical check-up di sistem.")
-        return
-
+    # --- 2️⃣ Load this employee's history only ------------------------------
     # ✅ Coerce UID to string to avoid type mismatch
-    karyawan_data = df[df["uid"].astype(str) == str(uid)]
+    karyawan_data = get_checkups_for_uid(
+        str(uid),
+        columns=[
+            "tanggal", "lokasi", "jabatan", "umur",
+            "tinggi", "berat", "lingkar_perut", "bmi",
+            "gestational_diabetes", "cholesterol", "asam_urat", "status"
+        ]
+    )
 
     if karyawan_data.empty:
         st.warning("❌ Data medical check-up tidak ditemukan untuk UID yang diberikan.")
         return
 
-    # --- 3️⃣ Add Unwell Status ----------------------------------------------
-    # Simple categorization example (adjust logic as needed)
-    def categorize_unwell(row):
-        thresholds = {
-            "bmi": 30,
-            "gestational_diabetes": 120,
-            "cholesterol": 240,
-            "asam_urat": 7
-        }
-        for key, limit in thresholds.items():
-            if row.get(key, 0) > limit:
-                return "Unwell"
-        return "Healthy"
-
-    karyawan_data["Status"] = karyawan_data.apply(categorize_unwell, axis=1)
+    # --- 3️⃣ Status ----------------------------------------------------------
+    # Status is stored with each checkup; per-metric flags come from the same rules
+    karyawan_data = karyawan_data.rename(columns={"status": "Status"})
+    flags = evaluate_health(karyawan_data, get_health_rules()).drop(columns="status")
 
     # --- 4️⃣ Display history -------------------------------------------------
     st.subheader("📋 Riwayat Medical Check-Up")
     karyawan_data = karyawan_data.sort_values("tanggal", ascending=False)
     karyawan_data["tanggal"] = pd.to_datetime(karyawan_data["tanggal"]).dt.strftime("%Y-%m-%d")
 
-    # Highlight unwell rows
-    def highlight_unwell(row):
-        return ['background-color: #ffcccc' if row.Status == "Unwell" else '' for _ in row]
+    # Highlight unwell rows, and the out-of-range values in bold
+    def highlight_unwell(frame):
+        styles = pd.DataFrame("", index=frame.index, columns=frame.columns)
+        styles.loc[frame["Status"] == "Unwell", :] = "background-color: #ffcccc;"
+        for metric in flags.columns.intersection(frame.columns):
+            flagged = flags.loc[frame.index, metric]
+            styles.loc[flagged, metric] += " color: #b00020; font-weight: bold;"
+        return styles
 
     st.dataframe(
         karyawan_data[
@@ -70,7 +67,7 @@ def karyawan_interface(uid=None):
                 "gestational_diabetes", "cholesterol", "asam_urat",
                 "Status"
             ]
-        ].style.apply(highlight_unwell, axis=1),
+        ].style.apply(highlight_unwell, axis=None),
         use_container_width=True
     )
 
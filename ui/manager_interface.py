@@ -4,22 +4,25 @@ import pandas as pd
 from io import BytesIO
 from datetime import datetime
 from db.queries import (
-    load_checkups, save_uploaded_checkups, get_users, add_user, get_employees,
-    get_total_karyawan   # ✅ Added for total karyawan metric
+    load_checkups, aggregate_checkups, get_users, add_user, get_employees,
+    get_total_karyawan,   # ✅ Added for total karyawan metric
+    get_checkup_years, get_lokasi_options, STATUS_OPTIONS
 )
 from config.settings import CSV_FILENAME, EXCEL_FILENAME
-from utils.qr_utils import display_qr_code, save_qr_code_image
-import io, zipfile, uuid
-import altair as alt
+from ui.history_table import paginated_history_table
 
 LOKASI_DEFAULT = ["Kantor", "Rig 1", "Rig 2", "Rig 3", "Rig 4"]
 
+# Columns the dashboard actually renders (projection pushed down to SQL)
+DASHBOARD_COLUMNS = [
+    'uid','nama','jabatan','status','tanggal','lokasi','tinggi','lingkar_perut','bmi'
+]
+
 # -------------------------
 # Manager Interface
 # -------------------------
 def manager_interface(current_employee_uid=None):
     st.header("📊 Mini MCU - Manager Interface")
-    df = load_checkups()
     users_df = get_users()
     employees_df = get_employees()
 
@@ -31,30 +34,16 @@ def manager_interface(current_employee_uid=None):
     # ---------------- Tab 1: Dashboard ----------------
     with tab1:
         st.subheader("📖 Riwayat Check-Up Karyawan")
-        df['tanggal'] = pd.to_datetime(df['tanggal'], errors='coerce')
-        df['tanggal_lahir'] = pd.to_datetime(df['tanggal_lahir'], errors='coerce')
-
         if "manager_filter_mode" not in st.session_state:
             st.session_state["manager_filter_mode"] = "month_year"
         if "manager_filter_date_range" not in st.session_state:
             today = datetime.today()
             st.session_state["manager_filter_date_range"] = (today, today)
 
-        df['status'] = 'Well'
-        df.loc[
-            (df['gestational_diabetes'] > 120) |
-            (df['cholesterol'] > 240) |
-            (df['asam_urat'] > 7),
-            'status'
-        ] = 'Unwell'
-
-        df['bulan'] = df['tanggal'].dt.month.fillna(0).astype(int)
-        df['tahun'] = df['tanggal'].dt.year.fillna(0).astype(int)
-
         month_names = ["All","Jan","Feb","Mar","Apr","May","Jun","Jul","Aug",
                        "Sep","Oct","Nov","Dec"]
-        lokasi_options = sorted(set(LOKASI_DEFAULT) | set(df['lokasi'].dropna().tolist()))
-        status_options = df['status'].dropna().unique().tolist() or ["Well","Unwell"]
+        lokasi_options = sorted(set(LOKASI_DEFAULT) | set(get_lokasi_options()))
+        status_options = STATUS_OPTIONS
 
         col1, col2, col3, col4 = st.columns([1,1,2,1])
         with col1:
@@ -68,7 +57,7 @@ def manager_interface(current_employee_uid=None):
         with col2:
             filter_tahun = st.selectbox(
                 "Filter Tahun",
-                options=[0] + sorted(df["tahun"].unique()),
+                options=[0] + get_checkup_years(),
                 index=0,
                 format_func=lambda x: "All" if x == 0 else str(x),
                 key="manager_filter_tahun"
@@ -100,41 +89,45 @@ def manager_interface(current_employee_uid=None):
                 start_date, end_date = date_range, date_range
             st.session_state["manager_filter_date_range"] = (start_date, end_date)
         else:
-            start_date = pd.Timestamp.min
-            end_date   = pd.Timestamp.max
-
-        df_filtered = df.copy()
-        df_filtered = df_filtered[
-            (df_filtered['tanggal'] >= pd.to_datetime(start_date)) &
-            (df_filtered['tanggal'] <= pd.to_datetime(end_date))
-        ]
-        if filter_tahun != 0:
-            df_filtered = df_filtered[df_filtered['tahun'] == filter_tahun]
-        if filter_bulan != 0:
-            df_filtered = df_filtered[df_filtered['bulan'] == filter_bulan]
-        if filter_lokasi:
-            df_filtered = df_filtered[df_filtered['lokasi'].isin(filter_lokasi)]
-        if filter_status:
-            df_filtered = df_filtered[df_filtered['status'].isin(filter_status)]
+            start_date = None
+            end_date   = None
+
+        # ⚡ Filters and aggregation run in Postgres; only the grouped counts are loaded
+        checkup_filters = dict(
+            date_from=start_date,
+            date_to=end_date,
+            year=filter_tahun or None,
+            month=filter_bulan or None,
+            lokasi=filter_lokasi or None,
+            status=filter_status or None,
+        )
 
         # ✅ Use database total karyawan metric
         total_karyawan = get_total_karyawan()
 
-        # ⚡ Deduplicate for KPIs: only latest checkup per UID
-        df_latest = df_filtered.sort_values('tanggal', ascending=False).drop_duplicates(subset=['uid'], keep='first')
+        # ⚡ KPIs over the latest checkup per UID (latest_checkups table)
+        kpi = aggregate_checkups(
+            metrics=["count", "well", "unwell"], latest_only=True, **checkup_filters
+        ).iloc[0]
 
         k1, k2, k3, k4 = st.columns(4)
         k1.metric("👥 Total Karyawan", total_karyawan)
-        k2.metric("📝 Total Checkups", len(df_latest))  # only latest per UID
-        k3.metric("✅ Well", (df_latest['status'] == "Well").sum())
-        k4.metric("⚠️ Unwell", (df_latest['status'] == "Unwell").sum())
-
-
-        summary = df_filtered.groupby("status").size().reindex(["Well","Unwell"], fill_value=0)
-        chart_df = summary.reset_index().rename(columns={'index': 'status'})
-        chart_df["count"] = chart_df["status"].map(lambda s: int(summary[s]))
+        k2.metric("📝 Total Checkups", int(kpi["count"]))  # only latest per UID
+        k3.metric("✅ Well", int(kpi["well"]))
+        k4.metric("⚠️ Unwell", int(kpi["unwell"]))
+
+
+        summary = (
+            aggregate_checkups(group_by=["status"], metrics=["count"], **checkup_filters)
+            .set_index("status")["count"]
+            .reindex(["Well","Unwell"], fill_value=0)
+        )
+        chart_df = summary.rename_axis("status").reset_index()
+        chart_df["count"] = chart_df["count"].astype(int)
         chart_df["status"] = chart_df["status"].astype(str)
 
+        import altair as alt   # charting stack loads only when a dashboard renders
+
         hbar = alt.Chart(chart_df).mark_bar().encode(
             y=alt.Y('status:N', title='Status'),
             x=alt.X('count:Q', title='Jumlah', axis=alt.Axis(format='d', tickMinStep=1)),
@@ -145,30 +138,8 @@ def manager_interface(current_employee_uid=None):
         ).properties(height=80)
         st.altair_chart(hbar, use_container_width=True)
 
-        df_filtered[['tinggi','lingkar_perut','bmi']] = (
-        df_filtered[['tinggi','lingkar_perut','bmi']].round(2)
-    )
-
-    def highlight_unwell(row):
-        return ['color: red' if row.status == 'Unwell' else '' for _ in row]
-
-    display_cols = [
-        'uid','nama','jabatan',
-        'status','tanggal','lokasi','tinggi','lingkar_perut','bmi'
-]
-
-    # data frame #
-    df_latest = df_filtered.sort_values('tanggal', ascending=False).drop_duplicates(subset=['uid'], keep='first')
-    df_to_display = df_latest[display_cols].reset_index(drop=True)  # reset index to make it sequential
-
-    st.dataframe(
-        df_to_display.style.format({
-            'tinggi': '{:.2f}',
-            'lingkar_perut': '{:.2f}',
-            'bmi': '{:.2f}'
-        }).apply(highlight_unwell, axis=1),
-        use_container_width=True
-    )
+    # data frame: one page of latest-per-UID rows at a time #
+    paginated_history_table("manager_history", DASHBOARD_COLUMNS, checkup_filters)
 
     # ---------------- Tab 2: User Management ----------------
     with tab2:
@@ -220,57 +191,95 @@ def manager_interface(current_employee_uid=None):
     # ---------------- Tab 4: Export Data ----------------
     with tab4:
         st.subheader("📥 Download Data")
-        if df.empty:
-            st.warning("⚠️ Tidak ada data untuk di-download.")
-        else:
-            df_export = df.copy()
-            for col in ['tinggi','lingkar_perut','bmi']:
-                if col in df_export.columns:
-                    df_export[col] = df_export[col].round(2)
+        # Full history is only loaded when an export is actually requested
+        if st.checkbox("Siapkan file export (seluruh riwayat check-up)", key="manager_prepare_export"):
+            df = load_checkups()
+            if df.empty:
+                st.warning("⚠️ Tidak ada data untuk di-download.")
+            else:
+                df_export = df.copy()
+                for col in ['tinggi','lingkar_perut','bmi']:
+                    if col in df_export.columns:
+                        df_export[col] = df_export[col].round(2)
 
-            csv = df_export.to_csv(index=False).encode("utf-8")
-            st.download_button("Download CSV", data=csv, file_name=CSV_FILENAME, mime="text/csv")
+                csv = df_export.to_csv(index=False).encode("utf-8")
+                st.download_button("Download CSV", data=csv, file_name=CSV_FILENAME, mime="text/csv")
 
-            output = BytesIO()
-            with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-                df_export.to_excel(writer, index=False, sheet_name="CheckUp")
-            st.download_button("Download Excel", data=output.getvalue(), file_name=EXCEL_FILENAME,
-                               mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+                output = BytesIO()
+                with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
+                    df_export.to_excel(writer, index=False, sheet_name="CheckUp")
+                st.download_button("Download Excel", data=output.getvalue(), file_name=EXCEL_FILENAME,
+                                   mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
 
     # ---------------- Tab 5: Upload Master Data Karyawan ----------------
     with tab5:
         st.subheader("upload master data karyawan")
-        uploaded_file = st.file_uploader("Pilih file XLS/CSV", type=["xls", "xlsx", "csv"])
+        # The uploader key is bumped after each import so the rerun starts with an empty widget
+        st.session_state.setdefault("upload_widget_version", 0)
+        if "upload_message" in st.session_state:
+            level, message = st.session_state.pop("upload_message")
+            getattr(st, level)(message)
+        upload_errors = st.session_state.pop("upload_errors", None)
+        if upload_errors is not None and not upload_errors.empty:
+            st.warning(f"⚠️ {upload_errors['row'].nunique()} baris tidak disimpan karena data tidak valid:")
+            st.dataframe(upload_errors, use_container_width=True, hide_index=True)
+            st.download_button(
+                "Download daftar error (CSV)",
+                data=upload_errors.to_csv(index=False).encode("utf-8"),
+                file_name="upload_errors.csv", mime="text/csv"
+            )
+
+        uploaded_file = st.file_uploader(
+            "Pilih file XLS/CSV", type=["xls", "xlsx", "csv"],
+            key=f"upload_file_{st.session_state['upload_widget_version']}"
+        )
         if uploaded_file:
-            try:
-                df_upload = (
-                    pd.read_csv(uploaded_file)
-                    if uploaded_file.name.lower().endswith(".csv")
-                    else pd.read_excel(uploaded_file)
-                )
+            from db.ingest import ingest_upload, EmptyUploadError
 
-                from utils.helpers import prepare_uploaded_df, prepare_karyawan_master_df
-                from db.queries import save_uploaded_karyawan
+            progress = st.progress(0.0, text="Memproses file...")
 
-                cols_lower = {c.strip().lower() for c in df_upload.columns}
-                medical_markers = {
-                    "tanggal", "tanggal_lahir", "tinggi", "berat",
-                    "lingkar_perut", "bmi", "gestational_diabetes",
-                    "cholesterol", "asam_urat", "umur"
-                }
+            def show_progress(rows, fraction):
+                progress.progress(
+                    fraction if fraction is not None else 0.0,
+                    text=f"{rows} baris tersimpan..."
+                )
 
-                if cols_lower & medical_markers:
-                    df_upload = prepare_uploaded_df(df_upload)
-                    save_uploaded_checkups(df_upload)
+            try:
+                # Same content already committed -> returned from the ledger, nothing re-imported;
+                # an interrupted import of the same file resumes after its last committed chunk
+                job = ingest_upload(uploaded_file, uploaded_file.name, on_progress=show_progress)
+
+                counts = job["result"]
+                if job["kind"] == "checkups":
+                    summary = f"{counts.get('saved', 0)} data check-up"
+                    if counts.get("rejected"):
+                        summary += f", {counts['rejected']} baris ditolak"
                 else:
-                    df_upload = prepare_karyawan_master_df(df_upload)
-                    save_uploaded_karyawan(df_upload)
-
-                st.success(
-                    f"✅ File '{uploaded_file.name}' berhasil di-upload "
-                    "dan disimpan ke database!"
-                )
+                    summary = (
+                        f"{counts.get('inserted', 0)} karyawan baru, {counts.get('updated', 0)} diperbarui, "
+                        f"{counts.get('unchanged', 0)} tidak berubah"
+                    )
+                    if counts.get("rejected"):
+                        summary += f", {counts['rejected']} baris ditolak"
+
+                if job["duplicate"]:
+                    uploaded_at = job["finished_at"] or job["updated_at"]
+                    st.session_state["upload_message"] = (
+                        "info",
+                        f"ℹ️ File '{uploaded_file.name}' sudah pernah di-upload pada "
+                        f"{uploaded_at:%Y-%m-%d %H:%M} ({summary}). Tidak ada data yang ditambahkan."
+                    )
+                else:
+                    st.session_state["upload_message"] = (
+                        "success",
+                        f"✅ File '{uploaded_file.name}' berhasil di-upload "
+                        f"dan disimpan ke database! ({summary})"
+                    )
+                st.session_state["upload_errors"] = job["errors"]
+                st.session_state["upload_widget_version"] += 1
                 st.rerun()
+            except EmptyUploadError as ee:
+                st.warning(f"⚠️ {ee}")
             except ValueError as ve:
                 st.error(f"⚠️ Kolom wajib tidak lengkap: {ve}")
             except Exception as e:
@@ -306,4 +315,52 @@ def manager_interface(current_employee_uid=None):
         except sqlalchemy.exc.ProgrammingError:
             st.warning("⚠️ Tabel riwayat upload belum dibuat. Silakan upload master karyawan terlebih dahulu.")
 
+        # --- Health rules (thresholds behind the Well/Unwell status) ---
+        st.markdown("---")
+        st.subheader("⚙️ Aturan Kesehatan")
+        st.caption(
+            "Nilai di bawah batas bawah atau di atas batas atas ditandai Unwell. "
+            "Rentang umur kosong berlaku untuk semua umur; rentang yang lebih sempit diutamakan."
+        )
+
+        from db.queries import get_health_rules, save_health_rules
+        from utils.health import RULE_COLUMNS, RULE_METRIC_OPTIONS
+
+        edited_rules = st.data_editor(
+            get_health_rules()[RULE_COLUMNS],
+            num_rows="dynamic",
+            use_container_width=True,
+            hide_index=True,
+            key="health_rules_editor",
+            column_config={
+                "metric": st.column_config.SelectboxColumn("Metrik", options=RULE_METRIC_OPTIONS, required=True),
+                "age_min": st.column_config.NumberColumn("Umur min", min_value=0, step=1),
+                "age_max": st.column_config.NumberColumn("Umur max", min_value=0, step=1),
+                "min_value": st.column_config.NumberColumn("Batas bawah"),
+                "max_value": st.column_config.NumberColumn("Batas atas"),
+            },
+        )
+        if st.button("💾 Simpan Aturan & Hitung Ulang Status"):
+            rules = edited_rules.dropna(subset=["metric"])
+            no_limit = rules["min_value"].isnull() & rules["max_value"].isnull()
+            bad_band = rules["age_min"].notnull() & rules["age_max"].notnull() & \
+                (rules["age_min"] > rules["age_max"])
+            if no_limit.any():
+                st.error("⚠️ Setiap aturan harus punya batas bawah atau batas atas.")
+            elif bad_band.any():
+                st.error("⚠️ Umur min tidak boleh lebih besar dari umur max.")
+            else:
+                try:
+                    from db.backfill_status import backfill_status
+                    from db.database import get_engine
+                    from db.cache import bump
+
+                    saved = save_health_rules(rules)
+                    with st.spinner("Menghitung ulang status check-up..."):
+                        changed = backfill_status(get_engine())   # reads the rules just saved
+                    bump("checkups")
+                    st.success(f"✅ {saved} aturan disimpan, status {changed} check-up diperbarui.")
+                except Exception as e:
+                    st.error(f"❌ Gagal menyimpan aturan: {e}")
+
 
@@ -135,9 +135,11 @@ def master_interface():
         if st.button("Reset Semua Password"):
             if default_pw:
                 try:
-                    for u in users_df["username"]:
-                        queries.reset_user_password(u, default_pw)
-                    st.success("✅ Semua password user berhasil di-reset.")
+                    with st.spinner("Mereset semua password..."):
+                        updated = queries.reset_user_passwords(
+                            {u: default_pw for u in users_df["username"]}
+                        )
+                    st.success(f"✅ Semua password user berhasil di-reset ({updated} user).")
                     st.experimental_rerun()
                 except Exception as e:
                     st.error(f"❌ Gagal mereset semua password: {e}")
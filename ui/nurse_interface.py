@@ -6,14 +6,23 @@ import uuid
 import io
 from db.queries import (
     save_checkups,
-    save_uploaded_checkups,
+    update_checkups,
     CHECKUP_COLUMNS,
     get_employees,
     get_employee_by_uid,
-    load_checkups
+    aggregate_checkups,
+    get_checkups_for_uid,
+    get_checkup_years,
+    get_lokasi_options,
+    count_checkup_employees,
+    STATUS_OPTIONS
 )
-from utils.helpers import validate_form, calculate_bmi, calculate_age
-import altair as alt
+from utils.helpers import (
+    validate_form, calculate_bmi, calculate_age,
+    calculate_bmi_series, calculate_age_series
+)
+from ui.history_table import paginated_history_table
+from utils.validation import BMI_BOUNDS
 
 LOKASI_OPTIONS = ["Rig 1", "Rig 2", "Rig 3", "Rig 4", "Kantor"]
 
@@ -142,8 +151,8 @@ def nurse_interface(current_employee_uid=None):
         bmi_val = calculate_bmi(berat, tinggi) if (berat and tinggi) else None
         st.text(f"BMI (otomatis): {round(bmi_val, 2) if bmi_val is not None else ''}")
 
-        gd = st.number_input("Gula Darah (mg/dL)", min_value=1.0, max_value=2000.0, step=0.1, key=f"tab2_gd_{k}")
-        chol = st.number_input("Cholesterol (mg/dL)", min_value=1.0, max_value=2000.0, step=0.1, key=f"tab2_chol_{k}")
+        gd = st.number_input("Gula Darah (mg/dL)", min_value=1.0, max_value=999.99, step=0.1, key=f"tab2_gd_{k}")
+        chol = st.number_input("Cholesterol (mg/dL)", min_value=1.0, max_value=999.99, step=0.1, key=f"tab2_chol_{k}")
         asam_urat = st.number_input("Asam Urat (mg/dL)", min_value=0.1, max_value=100.0, step=0.1, key=f"tab2_au_{k}")
 
         col_add, col_clear = st.columns([1, 1])
@@ -163,9 +172,11 @@ def nurse_interface(current_employee_uid=None):
                 if not asam_urat: missing.append("Asam Urat")
                 if missing:
                     st.error(f"⚠️ Field wajib belum diisi: {', '.join(missing)}")
+                elif bmi_val is not None and bmi_val > BMI_BOUNDS[1]:
+                    st.error(f"⚠️ BMI {bmi_val} di luar rentang {BMI_BOUNDS[0]}–{BMI_BOUNDS[1]}, periksa tinggi dan berat.")
                 else:
                     new_row = pd.DataFrame([{
-                        "employee_uid": st.session_state.get("selected_emp_uid"),
+                        "uid": st.session_state.get("selected_emp_uid"),
                         "tanggal": pd.to_datetime(tanggal_check),
                         "tanggal_lahir": pd.to_datetime(emp.get("tanggal_lahir")) if emp.get("tanggal_lahir") else pd.NaT,
                         "umur": umur,
@@ -213,30 +224,13 @@ def nurse_interface(current_employee_uid=None):
     with tab2:
         st.subheader("📖 Riwayat Check-Up Karyawan")
 
-        df = load_checkups()
-        df['tanggal'] = pd.to_datetime(df['tanggal'], errors='coerce')
-        df['tanggal_lahir'] = pd.to_datetime(df['tanggal_lahir'], errors='coerce')
-
     # --- Define default locations locally for now ---
         LOKASI_DEFAULT = ["Kantor", "Rig 1", "Rig 2", "Rig 3", "Rig 4"]
 
-    # --- Inline status assignment logic ---
-        df['status'] = 'Well'
-        df.loc[
-            (df['gestational_diabetes'] > 120) |
-            (df['cholesterol'] > 240) |
-            (df['asam_urat'] > 7),
-            'status'
-        ] = 'Unwell'
-
-    # --- Inline add_month_year logic ---
-        df['bulan'] = df['tanggal'].dt.month.fillna(0).astype(int)
-        df['tahun'] = df['tanggal'].dt.year.fillna(0).astype(int)
-
         month_names = ["All","Jan","Feb","Mar","Apr","May","Jun","Jul","Aug",
                        "Sep","Oct","Nov","Dec"]
-        lokasi_options = sorted(set(LOKASI_DEFAULT) | set(df['lokasi'].dropna().tolist()))
-        status_options = df['status'].dropna().unique().tolist() or ["Well","Unwell"]
+        lokasi_options = sorted(set(LOKASI_DEFAULT) | set(get_lokasi_options()))
+        status_options = STATUS_OPTIONS
 
         col1, col2, col3, col4 = st.columns([1,1,2,1])
         with col1:
@@ -250,7 +244,7 @@ def nurse_interface(current_employee_uid=None):
         with col2:
             filter_tahun = st.selectbox(
                 "Filter Tahun",
-                options=[0] + sorted(df["tahun"].unique()),
+                options=[0] + get_checkup_years(),
                 index=0,
                 format_func=lambda x: "All" if x == 0 else str(x),
                 key="nurse_filter_tahun"
@@ -270,44 +264,29 @@ def nurse_interface(current_employee_uid=None):
                 key="nurse_filter_status"
             )
 
-        df_filtered = df.copy()
-        if filter_tahun != 0:
-            df_filtered = df_filtered[df_filtered['tahun'] == filter_tahun]
-        if filter_bulan != 0:
-            df_filtered = df_filtered[df_filtered['bulan'] == filter_bulan]
-        if filter_lokasi:
-            df_filtered = df_filtered[df_filtered['lokasi'].isin(filter_lokasi)]
-        if filter_status:
-            df_filtered = df_filtered[df_filtered['status'].isin(filter_status)]
-
-    # Deduplicate for KPIs: only latest checkup per UID
-        df_latest = df_filtered.sort_values('tanggal', ascending=False).drop_duplicates(subset=['uid'], keep='first')
-
-    # KPIs
-        total_karyawan = len(df['uid'].unique())
-        k1, k2, k3, k4 = st.columns(4)
-        k1.metric("👥 Total Karyawan", total_karyawan)
-        k2.metric("📝 Total Checkups", len(df_latest))
-        k3.metric("✅ Well", (df_latest['status'] == "Well").sum())
-        k4.metric("⚠️ Unwell", (df_latest['status'] == "Unwell").sum())
-
-    # Highlight Unwell
-        def highlight_unwell(row):
-            return ['color: red' if row.status == 'Unwell' else '' for _ in row]
-
         display_cols = ['uid','nama','jabatan','status','tanggal','lokasi','tinggi','lingkar_perut','bmi']
 
-        df_to_display = df_latest[display_cols].sort_values("tanggal", ascending=False).reset_index(drop=True)
-
-        st.dataframe(
-            df_to_display.style.format({
-                'tinggi': '{:.2f}',
-                'lingkar_perut': '{:.2f}',
-            '   bmi': '{:.2f}'
-            }).apply(highlight_unwell, axis=1),
-            use_container_width=True
+        checkup_filters = dict(
+            year=filter_tahun or None,
+            month=filter_bulan or None,
+            lokasi=filter_lokasi or None,
+            status=filter_status or None,
         )
 
+    # KPIs over the latest checkup per UID, aggregated in Postgres
+        kpi = aggregate_checkups(
+            metrics=["count", "well", "unwell"], latest_only=True, **checkup_filters
+        ).iloc[0]
+        total_karyawan = count_checkup_employees()
+        k1, k2, k3, k4 = st.columns(4)
+        k1.metric("👥 Total Karyawan", total_karyawan)
+        k2.metric("📝 Total Checkups", int(kpi["count"]))
+        k3.metric("✅ Well", int(kpi["well"]))
+        k4.metric("⚠️ Unwell", int(kpi["unwell"]))
+
+    # History table, one keyset page at a time
+        paginated_history_table("nurse_history", display_cols, checkup_filters)
+
 
     # ----------------------
     # Tab 4: Download Data Karyawan
@@ -377,45 +356,51 @@ def nurse_interface(current_employee_uid=None):
                     selected_uid = selected_display.split("(")[-1].replace(")","").strip()
 
                 # Load existing check-ups
-                    df_checkups = load_checkups()
-                    df_emp = df_checkups[df_checkups["uid"].astype(str) == selected_uid]
+                    df_emp = get_checkups_for_uid(
+                        selected_uid, columns=["checkup_id"] + CHECKUP_COLUMNS + ["status"]
+                    )
 
                     if df_emp.empty:
                         st.info("ℹ️ Belum ada data check-up untuk karyawan ini.")
                     else:
                         st.markdown("**Klik cell untuk mengedit data.**")
                         edited_df = st.data_editor(   # ✅ updated call
-                            df_emp.drop(columns=["id"], errors="ignore"),
+                            df_emp,
                             num_rows="dynamic",
+                            disabled=["checkup_id", "uid", "umur", "bmi", "status"],
                             use_container_width=True
                         )
 
-                    # Auto calculate BMI and umur
+                    # Auto calculate BMI and umur (age at the checkup date)
                         if not edited_df.empty:
-                            for idx, row in edited_df.iterrows():
-                                try:
-                                # Recalculate umur
-                                    if "tanggal_lahir" in row and pd.notnull(row["tanggal_lahir"]):
-                                        dob = pd.to_datetime(row["tanggal_lahir"], dayfirst=True, errors="coerce")
-                                        if dob:
-                                            edited_df.at[idx, "umur"] = calculate_age(dob)
-                                        else:
-                                            edited_df.at[idx, "umur"] = None
-                                # Recalculate BMI
-                                    if "tinggi" in row and "berat" in row:
-                                        tinggi = float(row["tinggi"]) if pd.notnull(row["tinggi"]) else None
-                                        berat = float(row["berat"]) if pd.notnull(row["berat"]) else None
-                                        edited_df.at[idx, "bmi"] = calculate_bmi(berat, tinggi) if (berat and tinggi) else None
-                                except Exception:
-                                    pass
-
-                    # Save edited data
+                            edited_df["umur"] = calculate_age_series(
+                                edited_df["tanggal_lahir"], as_of=edited_df["tanggal"]
+                            )
+                            edited_df["bmi"] = calculate_bmi_series(edited_df["berat"], edited_df["tinggi"])
+
+                    # Save edited data: existing rows in place, added rows as new checkups
                         if st.button("💾 Simpan Perubahan"):
-                            try:
-                                save_uploaded_checkups(edited_df)
-                                st.success("✅ Data karyawan berhasil diperbarui.")
-                            except Exception as e:
-                                st.error(f"❌ Gagal menyimpan perubahan: {e}")
+                            bad_bmi = edited_df["bmi"] > BMI_BOUNDS[1]
+                            if bad_bmi.any():
+                                st.error(
+                                    f"⚠️ BMI di luar rentang {BMI_BOUNDS[0]}–{BMI_BOUNDS[1]} pada "
+                                    f"{int(bad_bmi.sum())} baris, periksa tinggi dan berat."
+                                )
+                            else:
+                                try:
+                                    existing = edited_df[edited_df["checkup_id"].notnull()]
+                                    added = edited_df[edited_df["checkup_id"].isnull()].copy()
+                                    updated = update_checkups(existing)
+                                    if not added.empty:
+                                        added["uid"] = selected_uid
+                                        added["tanggal"] = added["tanggal"].fillna(datetime.today().date())
+                                        save_checkups(added)
+                                    st.success(
+                                        f"✅ Data karyawan berhasil diperbarui "
+                                        f"({updated} diubah, {len(added)} ditambah)."
+                                    )
+                                except Exception as e:
+                                    st.error(f"❌ Gagal menyimpan perubahan: {e}")
 
         except Exception as e:
             st.error(f"❌ Gagal memuat data karyawan: {e}")
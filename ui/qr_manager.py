@@ -1,19 +1,21 @@
 # ui/qr_manager.py
+import os
+import tempfile
 import streamlit as st
 import pandas as pd
-import io, zipfile
-from db.queries import load_checkups, get_users
-from utils.qr_utils import display_qr_code, save_qr_code_image
+from db.queries import get_checkup_employees, get_users, get_employees, get_lokasi_options
+from config.settings import BADGE_SHEET_COLUMNS, BADGE_SHEET_ROWS
+from utils.qr_utils import display_qr_code, qr_png_bytes
+from utils.qr_batch import build_qr_zip, safe_filename
+from utils.qr_sheets import write_badge_sheets
 
 def qr_manager_interface():
     st.header("📱 QR Code Management")
 
     # --- Load data ---
     users_df = get_users()
-    checkups_df = load_checkups()
-
-    # --- Merge users with checkups to ensure we have UID ---
-    karyawan_data = checkups_df[['uid', 'nama']].drop_duplicates()
+    # One row per employee with checkups (no checkup history is loaded)
+    karyawan_data = get_checkup_employees()
     if karyawan_data.empty:
         st.warning("Belum ada data medical untuk karyawan.")
         st.info("Upload data medical karyawan terlebih dahulu.")
@@ -37,31 +39,85 @@ def qr_manager_interface():
     qr_data = f"mcu://karyawan/{selected_uid}"
     display_qr_code(qr_data, f"QR Code untuk {selected_name}")
 
-    if st.button("📥 Download QR Code"):
-        filename = save_qr_code_image(selected_name, qr_data)
-        with open(filename, "rb") as f:
-            qr_bytes = f.read()
-        st.download_button(
-            label="Download QR Code Image",
-            data=qr_bytes,
-            file_name=f"{selected_name}_qrcode.png",
-            mime="image/png"
-        )
+    # Same cached PNG as the preview above; nothing is written to disk
+    st.download_button(
+        label="📥 Download QR Code",
+        data=qr_png_bytes(qr_data),
+        file_name=f"{selected_name}_qrcode.png",
+        mime="image/png"
+    )
 
     # --- Bulk QR Generation ---
     st.markdown("---")
     st.subheader("📦 Download Semua QR Codes")
     if st.button("Generate & Download All QR Codes"):
-        zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(zip_buffer, mode="w") as zf:
-            for _, row in karyawan_data.iterrows():
-                name = row['nama']
-                uid = row['uid']
-                qr_path = save_qr_code_image(name, f"mcu://karyawan/{uid}")
-                zf.write(qr_path, arcname=f"{name}_qrcode.png")
+        progress = st.progress(0.0, text="Membuat QR codes...")
+
+        def on_progress(done, total):
+            # Redraw about every 1% instead of once per code
+            if done == total or done % max(total // 100, 1) == 0:
+                progress.progress(done / total, text=f"Membuat QR codes... {done}/{total}")
+
+        zip_bytes = build_qr_zip(
+            karyawan_data[['uid', 'nama']].itertuples(index=False, name=None),
+            on_progress=on_progress
+        )
+        progress.empty()
         st.download_button(
             label="Download ZIP of All QR Codes",
-            data=zip_buffer.getvalue(),
+            data=zip_bytes,
             file_name="all_karyawan_qrcodes.zip",
             mime="application/zip"
         )
+
+    # --- Printable A4 badge sheets ---
+    st.markdown("---")
+    st.subheader("🖨️ Cetak Lembar QR (A4)")
+    lokasi_filter = st.multiselect("Lokasi", options=get_lokasi_options(),
+                                   help="Kosongkan untuk semua lokasi")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        sheet_columns = st.number_input("Kolom per halaman", min_value=1, max_value=6,
+                                        value=BADGE_SHEET_COLUMNS)
+    with col2:
+        sheet_rows = st.number_input("Baris per halaman", min_value=1, max_value=8,
+                                     value=BADGE_SHEET_ROWS)
+    with col3:
+        sheet_format = st.radio("Format", ["PDF", "PNG (ZIP)"], horizontal=True)
+
+    employees = get_employees()
+    if lokasi_filter:
+        employees = employees[employees['lokasi'].isin(lokasi_filter)]
+    per_page = int(sheet_columns * sheet_rows)
+    st.caption(f"{len(employees)} karyawan, {-(-len(employees) // per_page)} halaman")
+
+    if st.button("Buat Lembar QR", disabled=employees.empty):
+        progress = st.progress(0.0, text="Membuat halaman...")
+        fmt = "pdf" if sheet_format == "PDF" else "png"
+        extension = "pdf" if fmt == "pdf" else "zip"
+        # Pages go straight to a file on disk; the download reads it from there
+        with tempfile.NamedTemporaryFile(suffix=f".{extension}", delete=False) as out:
+            path = out.name
+        try:
+            with open(path, "wb") as out:
+                write_badge_sheets(
+                    employees[['uid', 'nama', 'jabatan', 'lokasi']].itertuples(index=False, name=None),
+                    out,
+                    fmt=fmt,
+                    columns=int(sheet_columns),
+                    rows=int(sheet_rows),
+                    on_progress=lambda done, total: progress.progress(
+                        done / total, text=f"Membuat halaman... {done}/{total}"
+                    )
+                )
+            progress.empty()
+            suffix = "_".join(lokasi_filter) if lokasi_filter else "semua"
+            with open(path, "rb") as sheets:
+                st.download_button(
+                    label="📥 Download Lembar QR",
+                    data=sheets,
+                    file_name=f"qr_badges_{safe_filename(suffix)}.{extension}",
+                    mime="application/pdf" if fmt == "pdf" else "application/zip"
+                )
+        finally:
+            os.remove(path)
@@ -0,0 +1,113 @@
+# utils/health.py
+"""
+Health rules engine: the single evaluator for checkup status.
+
+Rules come from the health_rules table (db.queries.get_health_rules) as a
+frame with one row per rule:
+
+    metric     checkup column the rule applies to (bmi, cholesterol, ...)
+    age_min    inclusive lower age bound, or NULL
+    age_max    inclusive upper age bound, or NULL
+    min_value  flag values below this, or NULL
+    max_value  flag values above this, or NULL
+
+For every metric each row gets the limits of its most specific matching rule
+(an age band beats no band, a narrower band beats a wider one). Evaluation
+is one vectorized pass per rule over NumPy arrays, so the cost is
+rules x rows with no per-row Python.
+"""
+import numpy as np
+import pandas as pd
+
+STATUS_WELL = "Well"
+STATUS_UNWELL = "Unwell"
+
+RULE_COLUMNS = ["metric", "age_min", "age_max", "min_value", "max_value"]
+# Allowed by the health_rules.metric CHECK constraint (db/migrations.py)
+RULE_METRIC_OPTIONS = [
+    "bmi", "gestational_diabetes", "cholesterol", "asam_urat",
+    "lingkar_perut", "tinggi", "berat"
+]
+
+AGE_COLUMN = "umur"
+
+
+def _rule_specificity(rules: pd.DataFrame) -> pd.Series:
+    age_min = pd.to_numeric(rules["age_min"], errors="coerce")
+    age_max = pd.to_numeric(rules["age_max"], errors="coerce")
+    has_band = age_min.notnull() | age_max.notnull()
+    band = (age_max.fillna(200) - age_min.fillna(0)).clip(lower=0)
+    return has_band * 500 - band
+
+
+def _numeric(df, column):
+    if column not in df.columns:
+        return None
+    return pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=float)
+
+
+def metric_limits(df: pd.DataFrame, rules: pd.DataFrame):
+    """
+    Per-row (low, high) limit arrays for every metric in rules, taken from
+    the most specific rule matching each row. NaN means no limit.
+    """
+    n = len(df)
+    ages = _numeric(df, AGE_COLUMN)
+
+    rules = rules.assign(_specificity=_rule_specificity(rules))
+    rules = rules.sort_values("_specificity", kind="stable")
+
+    limits = {}
+    for metric, metric_rules in rules.groupby("metric", sort=False):
+        low = np.full(n, np.nan)
+        high = np.full(n, np.nan)
+        # Least specific first, so more specific rules overwrite where they match
+        for rule in metric_rules.itertuples(index=False):
+            match = np.ones(n, dtype=bool)
+            if pd.notnull(rule.age_min) or pd.notnull(rule.age_max):
+                if ages is None:
+                    continue
+                if pd.notnull(rule.age_min):
+                    match &= ages >= rule.age_min
+                if pd.notnull(rule.age_max):
+                    match &= ages <= rule.age_max
+            low[match] = np.nan if pd.isnull(rule.min_value) else float(rule.min_value)
+            high[match] = np.nan if pd.isnull(rule.max_value) else float(rule.max_value)
+        limits[metric] = (low, high)
+    return limits
+
+
+def evaluate_health(df: pd.DataFrame, rules: pd.DataFrame) -> pd.DataFrame:
+    """
+    Per-metric flags plus overall status for a checkup frame.
+
+    Returns a frame indexed like df with one boolean column per metric
+    (True = out of range) and a 'status' column. Missing values are never
+    flagged.
+    """
+    flags = {}
+    unwell = np.zeros(len(df), dtype=bool)
+    for metric, (low, high) in metric_limits(df, rules).items():
+        values = _numeric(df, metric)
+        if values is None:
+            continue
+        flagged = (values < low) | (values > high)
+        flags[metric] = flagged
+        unwell |= flagged
+
+    result = pd.DataFrame(flags, index=df.index)
+    result["status"] = np.where(unwell, STATUS_UNWELL, STATUS_WELL)
+    return result
+
+
+def compute_status(df: pd.DataFrame, rules: pd.DataFrame) -> pd.Series:
+    """Well/Unwell for every row of a checkup frame."""
+    return evaluate_health(df, rules)["status"]
+
+
+def rule_metrics(rules: pd.DataFrame) -> list:
+    """Checkup columns the rules read: every metric, plus umur when an age band is used."""
+    columns = list(dict.fromkeys(rules["metric"]))
+    if (rules["age_min"].notnull() | rules["age_max"].notnull()).any():
+        columns.append(AGE_COLUMN)
+    return columns
@@ -1,4 +1,5 @@
 from datetime import date, datetime
+import numpy as np
 import pandas as pd
 import uuid
 
@@ -47,6 +48,46 @@ def calculate_age(birth_date):
     return age
 
 
+# -------------------- Vectorized versions for whole columns -------------------- #
+
+def calculate_bmi_series(weight_kg, height_cm) -> pd.Series:
+    """
+    calculate_bmi() for whole columns: BMI rounded to 2 decimals,
+    0 where weight or height is missing or not positive.
+    """
+    weight = pd.to_numeric(pd.Series(weight_kg), errors="coerce")
+    height = pd.to_numeric(pd.Series(height_cm), errors="coerce").set_axis(weight.index)
+    w = weight.to_numpy(dtype=float)
+    h = height.to_numpy(dtype=float) / 100
+    valid = (w > 0) & (h > 0)
+    bmi = np.zeros(len(w))
+    bmi[valid] = np.round(w[valid] / h[valid] ** 2, 2)
+    return pd.Series(bmi, index=weight.index)
+
+def calculate_age_series(birth_dates, as_of=None) -> pd.Series:
+    """
+    calculate_age() for whole columns: completed years at as_of
+    (a date column aligned with birth_dates, e.g. the checkup date, or a
+    single date; rows without one use today). 0 where birth date is missing.
+    """
+    birth = pd.to_datetime(pd.Series(birth_dates), errors="coerce")
+    b = birth.to_numpy(dtype="datetime64[D]")
+
+    if as_of is None or np.isscalar(as_of) or isinstance(as_of, (date, pd.Timestamp)):
+        ref = np.full(len(b), np.datetime64(pd.Timestamp(as_of or date.today()).date(), "D"))
+    else:
+        ref = pd.to_datetime(pd.Series(as_of), errors="coerce").to_numpy(dtype="datetime64[D]")
+        ref = np.where(np.isnat(ref), np.datetime64(date.today(), "D"), ref)
+
+    # Whole months between the dates, minus one if the day of month is not reached yet
+    b_month = b.astype("datetime64[M]")
+    ref_month = ref.astype("datetime64[M]")
+    months = (ref_month - b_month).astype("int64")
+    months -= (ref - ref_month.astype("datetime64[D]")) < (b - b_month.astype("datetime64[D]"))
+    age = np.where(np.isnat(b), 0, months // 12)
+    return pd.Series(age.astype(int), index=birth.index)
+
+
 # -------------------- New Helper for Unified Upload Flow -------------------- #
 
 def prepare_uploaded_df(df: pd.DataFrame) -> pd.DataFrame:
@@ -60,7 +101,7 @@ def prepare_uploaded_df(df: pd.DataFrame) -> pd.DataFrame:
     3. Validate & auto-fill required columns
        - Convert date columns to datetime
        - Compute BMI if missing and weight/height available
-       - Compute umur if missing and tanggal_lahir available
+       - Compute umur if missing and tanggal_lahir available (age at tanggal)
     4. Raise ValueError if any required columns remain missing.
     """
     REQUIRED = [
@@ -89,19 +130,14 @@ def prepare_uploaded_df(df: pd.DataFrame) -> pd.DataFrame:
     # --- 4. Auto-compute BMI if needed ---
     if "bmi" not in df_clean.columns:
         if {"tinggi", "berat"}.issubset(df_clean.columns):
-            df_clean["bmi"] = df_clean.apply(
-                lambda r: calculate_bmi(r["berat"], r["tinggi"])
-                if pd.notnull(r["berat"]) and pd.notnull(r["tinggi"])
-                else 0,
-                axis=1,
-            )
+            df_clean["bmi"] = calculate_bmi_series(df_clean["berat"], df_clean["tinggi"])
         else:
             df_clean["bmi"] = 0
 
     # --- 5. Auto-compute umur if applicable ---
     if "umur" not in df_clean.columns and "tanggal_lahir" in df_clean.columns:
-        df_clean["umur"] = df_clean["tanggal_lahir"].apply(
-            lambda d: calculate_age(d) if pd.notnull(d) else 0
+        df_clean["umur"] = calculate_age_series(
+            df_clean["tanggal_lahir"], as_of=df_clean.get("tanggal")
         )
 
     # --- 6. Required-column validation ---
@@ -142,9 +178,9 @@ def prepare_karyawan_master_df(df: pd.DataFrame) -> pd.DataFrame:
     if "uid" not in df_clean.columns:
         df_clean["uid"] = [str(uuid.uuid4()) for _ in range(len(df_clean))]
     else:
-        # fill empty or NaN with new uuid
+        # fill empty, whitespace-only or NaN with new uuid
         df_clean["uid"] = df_clean["uid"].apply(
-            lambda x: str(uuid.uuid4()) if pd.isnull(x) or x == "" else str(x)
+            lambda x: str(uuid.uuid4()) if pd.isnull(x) or str(x).strip() == "" else str(x).strip()
         )
 
     return df_clean
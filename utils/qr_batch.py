@@ -0,0 +1,102 @@
+# utils/qr_batch.py
+"""
+Bulk QR rendering for the QR manager.
+
+Codes that are not in utils.qr_cache yet are encoded in a process pool
+(QR_RENDER_WORKERS processes, QR_RENDER_BATCH codes per task) with at most
+two tasks per worker in flight, and every PNG goes straight from memory
+into the ZIP as it arrives; nothing is written to qr_codes/. Workers are
+spawned rather than forked from the threaded Streamlit server and only run
+utils.qr_render; the cache is read and filled in this process. Entries are
+named by UID, so employees sharing a name no longer overwrite each other.
+"""
+import io
+import multiprocessing
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from config.settings import QR_RENDER_WORKERS, QR_RENDER_BATCH
+from utils import qr_cache
+from utils.qr_render import QR_RENDER_PARAMS, render_qr_png, render_qr_pngs
+
+KARYAWAN_QR_PREFIX = "mcu://karyawan/"
+
+
+def karyawan_qr_payload(uid) -> str:
+    return f"{KARYAWAN_QR_PREFIX}{uid}"
+
+
+def safe_filename(label, max_length=60) -> str:
+    """label reduced to letters, digits, '-' and '_' for use in a file name."""
+    cleaned = re.sub(r"[^0-9A-Za-z_-]+", "_", str(label)).strip("_")
+    return cleaned[:max_length] or "tanpa_nama"
+
+
+def qr_entry_name(uid, nama) -> str:
+    """ZIP entry of one code: "<uid>_<nama>.png"."""
+    return f"{safe_filename(uid)}_{safe_filename(nama)}.png"
+
+
+def iter_qr_pngs(payloads, workers=QR_RENDER_WORKERS, batch_size=QR_RENDER_BATCH, **params):
+    """
+    Yield (index, png_bytes) for every payload, cached ones first, the rest
+    as the workers finish them (not in input order). Rendered codes are
+    added to the cache.
+    """
+    params = {**QR_RENDER_PARAMS, **params}
+    missing = []
+    for index, payload in enumerate(payloads):
+        key = qr_cache.cache_key(payload, **params)
+        png = qr_cache.get(key)
+        if png is None:
+            missing.append((index, payload, key))
+        else:
+            yield index, png
+
+    # A pool does not pay off for a handful of codes
+    if workers <= 1 or len(missing) <= batch_size:
+        for index, payload, key in missing:
+            png = render_qr_png(payload, **params)
+            qr_cache.put(key, png)
+            yield index, png
+        return
+
+    batches = [missing[i:i + batch_size] for i in range(0, len(missing), batch_size)]
+    with ProcessPoolExecutor(max_workers=min(workers, len(batches)),
+                             mp_context=multiprocessing.get_context("spawn")) as pool:
+        pending = {}
+        next_batch = 0
+        while next_batch < len(batches) or pending:
+            # Bounded window: finished PNGs are consumed before more are queued
+            while next_batch < len(batches) and len(pending) < 2 * workers:
+                batch = batches[next_batch]
+                future = pool.submit(render_qr_pngs, [payload for _, payload, _ in batch], params)
+                pending[future] = batch
+                next_batch += 1
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch = pending.pop(future)
+                for (index, _, key), png in zip(batch, future.result()):
+                    qr_cache.put(key, png)
+                    yield index, png
+
+
+def build_qr_zip(karyawan, on_progress=None, **kwargs) -> bytes:
+    """
+    ZIP (as bytes) with one QR PNG per (uid, nama) pair in karyawan.
+    PNGs are already compressed, so entries are stored, not deflated.
+    on_progress(done, total) is called as codes are added.
+    """
+    karyawan = list(karyawan)
+    payloads = [karyawan_qr_payload(uid) for uid, _ in karyawan]
+    total = len(payloads)
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_STORED) as zf:
+        for done, (index, png) in enumerate(iter_qr_pngs(payloads, **kwargs), start=1):
+            uid, nama = karyawan[index]
+            zf.writestr(qr_entry_name(uid, nama), png)
+            if on_progress:
+                on_progress(done, total)
+    return buffer.getvalue()
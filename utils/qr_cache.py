@@ -0,0 +1,154 @@
+# utils/qr_cache.py
+"""
+Content-addressed cache of encoded QR PNGs.
+
+Entries are keyed by a SHA-256 of the payload plus every render parameter,
+so an unchanged code is encoded once and then served from:
+
+1. an in-process LRU of PNG bytes, bounded by QR_CACHE_MEMORY_BYTES, shared
+   by all Streamlit sessions of this server;
+2. a directory (QR_CACHE_DIR) of <key>.png files that survives restarts,
+   bounded by QR_CACHE_DISK_BYTES (least recently used files are removed).
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from config.settings import QR_CACHE_DIR, QR_CACHE_MEMORY_BYTES, QR_CACHE_DISK_BYTES
+
+_lock = threading.Lock()
+_memory = OrderedDict()   # key -> png bytes, least recently used first
+_memory_bytes = 0
+_disk_bytes = None        # measured on first write
+
+
+def cache_key(payload: str, **params) -> str:
+    """SHA-256 of the payload and render parameters."""
+    blob = json.dumps({"payload": payload, **params}, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _path(key: str) -> str:
+    return os.path.join(QR_CACHE_DIR, key[:2], f"{key}.png")
+
+
+def _remember(key: str, png: bytes) -> None:
+    global _memory_bytes
+    with _lock:
+        if key in _memory:
+            _memory.move_to_end(key)
+            return
+        _memory[key] = png
+        _memory_bytes += len(png)
+        while _memory_bytes > QR_CACHE_MEMORY_BYTES and len(_memory) > 1:
+            _, evicted = _memory.popitem(last=False)
+            _memory_bytes -= len(evicted)
+
+
+def _read_disk(key: str):
+    path = _path(key)
+    try:
+        with open(path, "rb") as f:
+            png = f.read()
+        os.utime(path)   # mtime doubles as last access for eviction
+        return png
+    except OSError:
+        return None
+
+
+def _disk_files():
+    for root, _, files in os.walk(QR_CACHE_DIR):
+        for name in files:
+            if name.endswith(".png"):
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+
+def _evict_disk() -> None:
+    """Delete least recently used files until the directory is under 90% of its bound."""
+    global _disk_bytes
+    files = sorted(_disk_files(), key=lambda f: f[2])
+    total = sum(size for _, size, _ in files)
+    target = QR_CACHE_DISK_BYTES * 0.9
+    for path, size, _ in files:
+        if total <= target:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+    _disk_bytes = total
+
+
+def _write_disk(key: str, png: bytes) -> None:
+    global _disk_bytes
+    path = _path(key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write-then-rename, so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(png)
+        os.replace(tmp_path, path)
+    except OSError:
+        return   # the disk tier is best effort; memory still has the entry
+
+    with _lock:
+        if _disk_bytes is None:
+            _disk_bytes = sum(size for _, size, _ in _disk_files())
+        else:
+            _disk_bytes += len(png)
+        if _disk_bytes > QR_CACHE_DISK_BYTES:
+            _evict_disk()
+
+
+def get(key: str):
+    """PNG bytes for key from memory, then disk; None if it is not cached."""
+    with _lock:
+        png = _memory.get(key)
+        if png is not None:
+            _memory.move_to_end(key)
+            return png
+
+    png = _read_disk(key)
+    if png is not None:
+        _remember(key, png)
+    return png
+
+
+def put(key: str, png: bytes) -> None:
+    """Store PNG bytes rendered elsewhere (e.g. by a worker process)."""
+    _write_disk(key, png)
+    _remember(key, png)
+
+
+def get_or_render(key: str, render) -> bytes:
+    """PNG bytes for key from the cache, else render() and store them."""
+    png = get(key)
+    if png is None:
+        png = render()
+        put(key, png)
+    return png
+
+
+def clear(disk=False) -> None:
+    """Drop the in-memory entries (and the disk directory's PNGs when disk=True)."""
+    global _memory_bytes, _disk_bytes
+    with _lock:
+        _memory.clear()
+        _memory_bytes = 0
+        if disk:
+            for path, _, _ in list(_disk_files()):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            _disk_bytes = 0
@@ -0,0 +1,46 @@
+# utils/qr_render.py
+"""
+Plain QR encoding, without Streamlit or the QR cache.
+
+This is what the bulk rendering worker processes import: it holds no
+module-level state, so a fresh worker interpreter starts quickly and never
+shares a lock with the server process.
+"""
+import io
+
+# Render parameters; all of them are part of the cache key (utils.qr_cache)
+QR_RENDER_PARAMS = {
+    "version": 1,
+    "error_correction": "L",
+    "box_size": 10,
+    "border": 4,
+    "fill_color": "black",
+    "back_color": "white",
+}
+
+
+def render_qr_png(data, version=1, error_correction="L", box_size=10, border=4,
+                  fill_color="black", back_color="white"):
+    """
+    Encode data as a QR code and return the PNG bytes (no caching)
+    """
+    import qrcode   # imported on first use, keeps qrcode/PIL out of app start-up
+
+    qr = qrcode.QRCode(
+        version=version,
+        error_correction=getattr(qrcode.constants, f"ERROR_CORRECT_{error_correction}"),
+        box_size=box_size,
+        border=border,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+
+    img = qr.make_image(fill_color=fill_color, back_color=back_color)
+    img_buffer = io.BytesIO()
+    img.save(img_buffer, format="PNG")
+    return img_buffer.getvalue()
+
+
+def render_qr_pngs(payloads, params):
+    """PNG bytes for each payload, in order (a worker process task)."""
+    return [render_qr_png(payload, **params) for payload in payloads]
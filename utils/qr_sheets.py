@@ -0,0 +1,251 @@
+# utils/qr_sheets.py
+"""
+Printable A4 sheets of karyawan QR badges.
+
+Badges (QR code + nama / jabatan / lokasi) are tiled columns x rows per
+page. Pages are rendered by a process pool and consumed in page order with
+at most two pages per worker in flight, and each finished page is written
+to the output PDF (or stored in a ZIP of PNG pages) before the next one is
+taken, so memory depends on the page size, not on the roster size.
+
+The PDF is streamed by _PdfWriter: every page is one image object holding
+the page PNG's compressed data as is, and only object offsets are kept
+until the page tree and xref table are written at the end. Pillow's own
+PDF writer would either rewrite the file on every appended page or hold
+all pages in memory.
+
+Workers are spawned rather than forked from the threaded Streamlit server.
+They get the QR PNGs already in utils.qr_cache with their page and encode
+only the missing ones themselves, without touching the cache.
+"""
+import io
+import multiprocessing
+import struct
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from config.settings import BADGE_SHEET_DPI, BADGE_SHEET_COLUMNS, BADGE_SHEET_ROWS, QR_RENDER_WORKERS
+from utils import qr_cache
+from utils.qr_batch import karyawan_qr_payload
+from utils.qr_render import QR_RENDER_PARAMS, render_qr_png
+
+A4_MM = (210, 297)
+MARGIN_MM = 8
+CAPTION_LINES = 3
+CUT_LINE_COLOR = 200   # light grey cell borders to cut along
+
+
+def _mm_to_px(mm, dpi):
+    return round(mm / 25.4 * dpi)
+
+
+def _font(size):
+    from PIL import ImageFont
+
+    try:
+        return ImageFont.truetype("DejaVuSans.ttf", size)
+    except OSError:
+        try:
+            return ImageFont.load_default(size=size)   # Pillow >= 10.1
+        except TypeError:
+            return ImageFont.load_default()
+
+
+def _fit_text(draw, text, font, width):
+    """text, shortened with "…" until it fits in width pixels."""
+    text = "" if text is None else str(text)
+    if draw.textlength(text, font=font) <= width:
+        return text
+    while text and draw.textlength(text + "…", font=font) > width:
+        text = text[:-1]
+    return text + "…"
+
+
+def render_sheet_page(badges, columns=BADGE_SHEET_COLUMNS, rows=BADGE_SHEET_ROWS, dpi=BADGE_SHEET_DPI):
+    """
+    One A4 page (PNG bytes, greyscale) with up to columns x rows badges.
+    badges: [(uid, nama, jabatan, lokasi, qr_png)], qr_png None when it is
+    not cached yet. Runs in the worker processes.
+    """
+    from PIL import Image, ImageDraw
+
+    width, height = (_mm_to_px(mm, dpi) for mm in A4_MM)
+    margin = _mm_to_px(MARGIN_MM, dpi)
+    cell_w = (width - 2 * margin) // columns
+    cell_h = (height - 2 * margin) // rows
+    pad = max(cell_w // 20, 4)
+    font_size = max(cell_h // 18, 10)
+    line_h = round(font_size * 1.3)
+    qr_size = min(cell_w - 2 * pad, cell_h - 2 * pad - CAPTION_LINES * line_h)
+
+    page = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(page)
+    font = _font(font_size)
+
+    for position, (uid, nama, jabatan, lokasi, qr_png) in enumerate(badges[:columns * rows]):
+        left = margin + (position % columns) * cell_w
+        top = margin + (position // columns) * cell_h
+        draw.rectangle([left, top, left + cell_w, top + cell_h], outline=CUT_LINE_COLOR)
+
+        if qr_png is None:
+            qr_png = render_qr_png(karyawan_qr_payload(uid), **QR_RENDER_PARAMS)
+        qr = Image.open(io.BytesIO(qr_png)).convert("L")
+        qr = qr.resize((qr_size, qr_size), Image.NEAREST)   # keep module edges sharp
+        page.paste(qr, (left + (cell_w - qr_size) // 2, top + pad))
+
+        y = top + pad + qr_size + pad // 2
+        for caption in (nama, jabatan, lokasi):
+            caption = _fit_text(draw, caption, font, cell_w - 2 * pad)
+            x = left + (cell_w - draw.textlength(caption, font=font)) / 2
+            draw.text((x, y), caption, fill=0, font=font)
+            y += line_h
+
+    buffer = io.BytesIO()
+    page.save(buffer, format="PNG", optimize=False)
+    return buffer.getvalue()
+
+
+def _with_cached_qr(page):
+    """Append each badge's cached QR PNG (or None) to its tuple."""
+    return [
+        (*badge, qr_cache.get(qr_cache.cache_key(karyawan_qr_payload(badge[0]), **QR_RENDER_PARAMS)))
+        for badge in page
+    ]
+
+
+def iter_sheet_pages(badges, columns=BADGE_SHEET_COLUMNS, rows=BADGE_SHEET_ROWS,
+                     dpi=BADGE_SHEET_DPI, workers=QR_RENDER_WORKERS):
+    """Yield the PNG bytes of every page, in page order."""
+    badges = list(badges)
+    per_page = columns * rows
+    pages = [badges[i:i + per_page] for i in range(0, len(badges), per_page)]
+    if workers <= 1 or len(pages) <= 1:
+        for page in pages:
+            yield render_sheet_page(_with_cached_qr(page), columns, rows, dpi)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(pages)),
+                             mp_context=multiprocessing.get_context("spawn")) as pool:
+        pending = deque()
+        for page in pages:
+            pending.append(pool.submit(render_sheet_page, _with_cached_qr(page), columns, rows, dpi))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class _PdfWriter:
+    """
+    One-pass PDF of full-page greyscale PNGs, written to a binary file.
+    Object numbers: 1 catalog, 2 page tree, then image, content and page
+    object for every page.
+    """
+    PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+    def __init__(self, out, dpi):
+        self.out = out
+        self.dpi = dpi
+        self.position = 0
+        self.offsets = {}
+        self.page_numbers = []
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write(self, data):
+        self.out.write(data)
+        self.position += len(data)
+
+    def _object(self, number, entries, stream=None):
+        """Dictionary object with entries (text between << and >>), plus stream."""
+        self.offsets[number] = self.position
+        if stream is None:
+            self._write(f"{number} 0 obj\n<< {entries} >>\nendobj\n".encode("ascii"))
+        else:
+            self._write(f"{number} 0 obj\n<< {entries} /Length {len(stream)} >>\nstream\n".encode("ascii"))
+            self._write(stream + b"\nendstream\nendobj\n")
+
+    @classmethod
+    def _png_image(cls, png):
+        """(width, height, zlib data) of an 8-bit greyscale, non-interlaced PNG."""
+        if png[:8] != cls.PNG_SIGNATURE:
+            raise ValueError("Sheet page is not a PNG")
+        position, header, data = 8, None, []
+        while position < len(png):
+            length, kind = struct.unpack(">I4s", png[position:position + 8])
+            chunk = png[position + 8:position + 8 + length]
+            if kind == b"IHDR":
+                header = struct.unpack(">IIBBBBB", chunk)
+            elif kind == b"IDAT":
+                data.append(chunk)
+            elif kind == b"IEND":
+                break
+            position += length + 12
+        if header is None or header[2:5] != (8, 0, 0) or header[6] != 0:
+            raise ValueError("Sheet page must be an 8-bit greyscale, non-interlaced PNG")
+        return header[0], header[1], b"".join(data)
+
+    def add_page(self, png):
+        width, height, data = self._png_image(png)
+        # PNG rows carry a filter byte each; predictor 15 lets the PDF
+        # reader undo them, so the compressed data is copied unchanged
+        image, content, page = (3 + 3 * len(self.page_numbers) + i for i in range(3))
+        self._object(
+            image,
+            f"/Type /XObject /Subtype /Image /Width {width} /Height {height} "
+            f"/ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /FlateDecode "
+            f"/DecodeParms << /Predictor 15 /Colors 1 /BitsPerComponent 8 /Columns {width} >>",
+            data,
+        )
+        page_w, page_h = (round(px * 72 / self.dpi, 2) for px in (width, height))
+        self._object(content, "", f"q {page_w} 0 0 {page_h} 0 0 cm /Im0 Do Q".encode("ascii"))
+        self._object(
+            page,
+            f"/Type /Page /Parent 2 0 R /MediaBox [0 0 {page_w} {page_h}] "
+            f"/Resources << /XObject << /Im0 {image} 0 R >> >> /Contents {content} 0 R",
+        )
+        self.page_numbers.append(page)
+
+    def close(self):
+        kids = " ".join(f"{number} 0 R" for number in self.page_numbers)
+        self._object(2, f"/Type /Pages /Kids [{kids}] /Count {len(self.page_numbers)}")
+        self._object(1, "/Type /Catalog /Pages 2 0 R")
+        xref = self.position
+        size = max(self.offsets) + 1
+        entries = "".join(f"{self.offsets[n]:010d} 00000 n \n" for n in range(1, size))
+        self._write(
+            f"xref\n0 {size}\n0000000000 65535 f \n{entries}"
+            f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("ascii")
+        )
+
+
+def write_badge_sheets(badges, out, fmt="pdf", on_progress=None, columns=BADGE_SHEET_COLUMNS,
+                       rows=BADGE_SHEET_ROWS, dpi=BADGE_SHEET_DPI, workers=QR_RENDER_WORKERS):
+    """
+    Render badge sheets into out (a binary file opened for writing) in one
+    pass and return the number of pages.
+
+    fmt "pdf" gives one multi-page PDF, "png" a ZIP of page_001.png, ...
+    on_progress(pages_done, pages_total) is called after every page.
+    """
+    if fmt not in ("pdf", "png"):
+        raise ValueError(f"Unknown sheet format: {fmt}")
+
+    badges = list(badges)
+    total = -(-len(badges) // (columns * rows))
+    pages = iter_sheet_pages(badges, columns, rows, dpi, workers)
+
+    if fmt == "pdf":
+        pdf = _PdfWriter(out, dpi)
+        for number, png in enumerate(pages, start=1):
+            pdf.add_page(png)
+            if on_progress:
+                on_progress(number, total)
+        pdf.close()
+    else:
+        with zipfile.ZipFile(out, mode="w", compression=zipfile.ZIP_STORED) as zf:
+            for number, png in enumerate(pages, start=1):
+                zf.writestr(f"page_{number:03d}.png", png)
+                if on_progress:
+                    on_progress(number, total)
+    return total
@@ -1,35 +1,29 @@
 # utils/qr_utils.py
-import qrcode
 import io
 import base64
 import streamlit as st
 from datetime import datetime
 import os
 
+from utils import qr_cache
+from utils.qr_render import QR_RENDER_PARAMS, render_qr_png
+
+
+def qr_png_bytes(data, **params):
+    """
+    PNG bytes of the QR code for data, encoded once per payload and parameters
+    """
+    params = {**QR_RENDER_PARAMS, **params}
+    key = qr_cache.cache_key(data, **params)
+    return qr_cache.get_or_render(key, lambda: render_qr_png(data, **params))
+
+
 def generate_qr_code(data, size=300):
     """
     Generate QR code from data and return as base64 encoded image
     """
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(data)
-    qr.make(fit=True)
-    
-    img = qr.make_image(fill_color="black", back_color="white")
-    
-    # Convert to bytes
-    img_buffer = io.BytesIO()
-    img.save(img_buffer, format="PNG")
-    img_buffer.seek(0)
-    
     # Convert to base64 for HTML embedding
-    img_str = base64.b64encode(img_buffer.getvalue()).decode()
-    
-    return img_str
+    return base64.b64encode(qr_png_bytes(data)).decode()
 
 def generate_karyawan_qr(nik):
     """
@@ -45,21 +39,21 @@ def save_qr_code_image(username, qr_data):
     """
     # Create qr_codes directory if it doesn't exist
     os.makedirs("qr_codes", exist_ok=True)
-    
-    # Generate and save QR code
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(qr_data)
-    qr.make(fit=True)
-    
-    img = qr.make_image(fill_color="black", back_color="white")
+
+    png = qr_png_bytes(qr_data)
     filename = f"qr_codes/{username}_qrcode.png"
-    img.save(filename)
-    
+
+    # Leave an identical file alone
+    try:
+        if os.path.getsize(filename) == len(png):
+            with open(filename, "rb") as f:
+                if f.read() == png:
+                    return filename
+    except OSError:
+        pass
+
+    with open(filename, "wb") as f:
+        f.write(png)
     return filename
 
 def display_qr_code(qr_data, title="QR Code"):
@@ -72,4 +66,4 @@ def display_qr_code(qr_data, title="QR Code"):
         f'<img src="data:image/png;base64,{img_str}" width="200" height="200">',
         unsafe_allow_html=True
     )
-    return img_str
\ No newline at end of file
+    return img_str
@@ -0,0 +1,177 @@
+# utils/validation.py
+"""
+Column-wise validation of uploaded checkup and master karyawan rows.
+
+Every check is a vectorized mask over a whole column; failing cells are
+collected into one error table (row, column, reason, value) and the rows
+without errors continue to prepare_uploaded_df() and the database. Bounds
+match the nurse input form, so uploaded and hand-entered data obey the same
+limits.
+"""
+import pandas as pd
+
+from utils.helpers import prepare_uploaded_df, prepare_karyawan_master_df
+
+# (min, max) inclusive, same as the number_input limits in ui/nurse_interface.py;
+# every max fits the NUMERIC(5,2) checkup columns (at most 999.99)
+CHECKUP_BOUNDS = {
+    "tinggi": (1, 300),
+    "berat": (1, 500),
+    "lingkar_perut": (1, 500),
+    "gestational_diabetes": (1, 999.99),
+    "cholesterol": (1, 999.99),
+    "asam_urat": (0.1, 100),
+}
+# Checked after prepare_uploaded_df(), so a BMI computed from berat/tinggi is
+# covered as well as a supplied one (0 = could not be computed)
+BMI_BOUNDS = (0, 999.99)
+REQUIRED_TEXT = ["nama"]
+# Accepted by PostgreSQL's uuid input: optional braces and hyphens
+UUID_PATTERN = r"^\{?[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}\}?$"
+ERROR_COLUMNS = ["row", "column", "reason", "value"]
+
+# Spreadsheet row of frame index 0 (row 1 is the header)
+FIRST_DATA_ROW = 2
+
+
+def _blank(series: pd.Series) -> pd.Series:
+    return series.isnull() | series.astype("string").str.strip().eq("").fillna(True)
+
+
+def _errors(df, mask, column, reason):
+    if not mask.any():
+        return None
+    values = df[column]
+    selected = mask.to_numpy()
+    return pd.DataFrame({
+        "row": df.index[selected] + FIRST_DATA_ROW,
+        "column": column,
+        "reason": reason,
+        "value": values[selected].astype("string").to_numpy(),
+    })
+
+
+def validate_checkup_rows(df: pd.DataFrame, today=None):
+    """
+    Check an uploaded checkup frame (lower-case column names).
+
+    Returns (valid_mask, errors): a boolean Series aligned with df and an
+    error DataFrame with ERROR_COLUMNS, one row per failing cell. "row" is
+    the spreadsheet row number, taking the frame index as the 0-based data
+    row. Missing columns are not reported here; prepare_uploaded_df raises.
+    """
+    today = pd.Timestamp(today or pd.Timestamp.today().normalize())
+    found = []
+    bad_rows = pd.Series(False, index=df.index)
+
+    def record(mask, column, reason):
+        nonlocal bad_rows
+        mask = mask.fillna(False).astype(bool)
+        found.append(_errors(df, mask, column, reason))
+        bad_rows |= mask
+
+    for column in REQUIRED_TEXT:
+        if column in df.columns:
+            record(_blank(df[column]), column, "wajib diisi")
+
+    for column, (low, high) in CHECKUP_BOUNDS.items():
+        if column not in df.columns:
+            continue
+        blank = _blank(df[column])
+        values = pd.to_numeric(df[column], errors="coerce")
+        record(blank, column, "wajib diisi")
+        record(~blank & values.isnull(), column, "bukan angka")
+        record((values < low) | (values > high), column, f"di luar rentang {low}–{high}")
+
+    tanggal = None
+    if "tanggal" in df.columns:
+        blank = _blank(df["tanggal"])
+        tanggal = pd.to_datetime(df["tanggal"], errors="coerce")
+        record(blank, "tanggal", "wajib diisi")
+        record(~blank & tanggal.isnull(), "tanggal", "format tanggal tidak valid")
+        record(tanggal > today, "tanggal", "tanggal di masa depan")
+
+    if "tanggal_lahir" in df.columns:
+        blank = _blank(df["tanggal_lahir"])
+        lahir = pd.to_datetime(df["tanggal_lahir"], errors="coerce")
+        record(~blank & lahir.isnull(), "tanggal_lahir", "format tanggal tidak valid")
+        reference = tanggal.fillna(today) if tanggal is not None else today
+        record(lahir > reference, "tanggal_lahir", "setelah tanggal pemeriksaan")
+
+    found = [f for f in found if f is not None]
+    errors = (
+        pd.concat(found, ignore_index=True).sort_values(["row", "column"], kind="stable")
+        if found else pd.DataFrame(columns=ERROR_COLUMNS)
+    )
+    return ~bad_rows, errors.reset_index(drop=True)
+
+
+def validate_uploaded_df(df: pd.DataFrame, today=None):
+    """
+    Validate, then prepare the rows that passed.
+
+    Returns (prepared_df, errors). prepared_df holds only valid rows, with
+    numeric columns converted, ready for save_uploaded_checkups(); errors is
+    the table from validate_checkup_rows() plus BMI range errors. Raises
+    ValueError for missing required columns (from prepare_uploaded_df).
+    """
+    df_clean = df.copy()
+    df_clean.columns = [str(c).strip().lower() for c in df_clean.columns]
+
+    valid, errors = validate_checkup_rows(df_clean, today=today)
+    prepared = prepare_uploaded_df(df_clean[valid])
+    for column in CHECKUP_BOUNDS:
+        if column in prepared.columns:
+            prepared[column] = pd.to_numeric(prepared[column], errors="coerce")
+
+    bmi = pd.to_numeric(prepared["bmi"], errors="coerce")
+    low, high = BMI_BOUNDS
+    bad_bmi = ((bmi < low) | (bmi > high)).fillna(False).astype(bool)
+    bmi_errors = _errors(prepared, bad_bmi, "bmi", f"di luar rentang {low}–{high}")
+    if bmi_errors is not None:
+        errors = pd.concat([errors, bmi_errors], ignore_index=True) \
+            .sort_values(["row", "column"], kind="stable").reset_index(drop=True)
+    prepared = prepared[~bad_bmi].assign(bmi=bmi[~bad_bmi])
+    return prepared, errors
+
+
+def validate_karyawan_rows(df: pd.DataFrame):
+    """
+    Check a master karyawan frame (lower-case column names): nama is
+    required and a filled-in uid must be a UUID. Returns (valid_mask,
+    errors) like validate_checkup_rows().
+    """
+    found = []
+    bad_rows = pd.Series(False, index=df.index)
+    for column in REQUIRED_TEXT:
+        if column in df.columns:
+            mask = _blank(df[column])
+            found.append(_errors(df, mask, column, "wajib diisi"))
+            bad_rows |= mask
+
+    if "uid" in df.columns:
+        uid = df["uid"].astype("string").str.strip()
+        mask = (~_blank(df["uid"]) & ~uid.str.match(UUID_PATTERN)).fillna(False).astype(bool)
+        found.append(_errors(df, mask, "uid", "bukan UUID"))
+        bad_rows |= mask
+
+    found = [f for f in found if f is not None]
+    errors = (
+        pd.concat(found, ignore_index=True).sort_values(["row", "column"], kind="stable")
+        if found else pd.DataFrame(columns=ERROR_COLUMNS)
+    )
+    return ~bad_rows, errors.reset_index(drop=True)
+
+
+def validate_uploaded_karyawan_df(df: pd.DataFrame):
+    """
+    Validate, then prepare the master karyawan rows that passed.
+    Returns (prepared_df, errors); raises ValueError for missing required
+    columns (from prepare_karyawan_master_df).
+    """
+    df_clean = df.copy()
+    df_clean.columns = [str(c).strip().lower() for c in df_clean.columns]
+
+    valid, errors = validate_karyawan_rows(df_clean)
+    prepared = prepare_karyawan_master_df(df_clean[valid])
+    return prepared, errors